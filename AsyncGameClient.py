@@ -0,0 +1,165 @@
+import os
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import paho.mqtt.client as paho
+from paho import mqtt
+from dotenv import load_dotenv
+
+import GameClient
+
+
+class AsyncGameServer:
+    """
+    asyncio front-end for the GameClient dispatch functions. paho's network thread only hands
+    messages to the event loop. The loop collects what is waiting and hands it to one game thread,
+    so a slow start or turn never blocks the loop, and publishes are sent as one batch per wake-up
+    rather than one network call at a time.
+    """
+
+    # Messages handled per batch before publishes are flushed, bounds how long a batch can wait
+    MAX_BATCH = 256
+
+    def __init__(self, publish_many):
+        """
+            :param publish_many: blocking callable taking a list of (topic, payload), run off the event loop
+        """
+        GameClient.init_lobby_state(self, turn_timer=self)
+        self.publish_many = publish_many
+        self.timers = {}
+        self.outbox = []
+        self.queue = asyncio.Queue()
+        self.loop = None
+        # One game thread handles messages in order, one sender thread keeps batches in order
+        # while the loop moves on to the next turns
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.sender = ThreadPoolExecutor(max_workers=1)
+        self.sending = None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        # Called by the dispatched functions, sent on the next flush
+        self.outbox.append((topic, payload))
+
+    def submit(self, topic, msg_payload):
+        # Thread safe, used from paho's network thread
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (topic, msg_payload))
+
+    def schedule(self, key, delay, callback):
+        # Called on the game thread. Turn deadlines are loop timers, the callback is queued like a
+        # message so its publishes get flushed
+        self.loop.call_soon_threadsafe(self.__schedule, key, delay, callback)
+
+    def cancel(self, key):
+        self.loop.call_soon_threadsafe(self.__cancel, key)
+
+    def __schedule(self, key, delay, callback):
+        self.__cancel(key)
+        self.timers[key] = self.loop.call_later(delay, self.queue.put_nowait, (None, callback))
+
+    def __cancel(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    def shutdown(self):
+        self.worker.shutdown()
+        self.sender.shutdown()
+
+    def handle(self, messages):
+        """
+        Runs on the game thread, a message that fails is dropped and the rest are still handled
+        :param messages: list of (topic, payload), topic None to run payload()
+        """
+        for topic, msg_payload in messages:
+            try:
+                if topic is None:
+                    msg_payload()
+                else:
+                    GameClient.handle_message(self, topic.split("/"), msg_payload)
+            except Exception:
+                print(f"Dropped message on {topic}:")
+                traceback.print_exc()
+
+    async def flush(self):
+        """
+        Starts sending the collected publishes, waiting only for the previous batch to finish
+        """
+        batch, self.outbox = self.outbox, []
+        if self.sending is not None:
+            await self.sending
+            self.sending = None
+        if batch:
+            self.sending = self.loop.run_in_executor(self.sender, self.publish_many, batch)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        while True:
+            message = await self.queue.get()
+            # Handle everything that's already waiting, then send all of its publishes together
+            messages = []
+            while message is not None:
+                messages.append(message)
+                if len(messages) == AsyncGameServer.MAX_BATCH or self.queue.empty():
+                    break
+                message = self.queue.get_nowait()
+            if messages:
+                await self.loop.run_in_executor(self.worker, self.handle, messages)
+            await self.flush()
+            if message is None:
+                await self.flush()
+                break
+
+    def on_message(self, client, userdata, msg):
+        """
+            Hands a message to the event loop ( used as callback for subscribe )
+            :param client: the client itself
+            :param userdata: userdata is set when initiating the client, here it is userdata=None
+            :param msg: the message with topic and payload
+        """
+        self.submit(msg.topic, msg.payload)
+
+
+def paho_publisher(client):
+    def publish_many(batch):
+        for topic, payload in batch:
+            client.publish(topic, payload)
+    return publish_many
+
+
+async def main(client):
+    server = AsyncGameServer(paho_publisher(client))
+    server.loop = asyncio.get_running_loop()
+    client.on_subscribe = GameClient.on_subscribe
+    client.on_message = server.on_message
+
+    client.loop_start()
+    for topic in GameClient.server_topics:
+        client.subscribe(topic)
+    try:
+        await server.serve()
+    finally:
+        client.loop_stop()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    load_dotenv(dotenv_path='./credentials.env')
+
+    broker_address = os.environ.get('BROKER_ADDRESS')
+    broker_port = int(os.environ.get('BROKER_PORT'))
+    username = os.environ.get('USER_NAME')
+    password = os.environ.get('PASSWORD')
+
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="GameClient", userdata=None, protocol=paho.MQTTv5)
+    # enable TLS for secure connection
+    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # set username and password
+    client.username_pw_set(username, password)
+    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
+    client.connect(broker_address, broker_port)
+
+    asyncio.run(main(client))
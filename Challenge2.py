@@ -40,23 +40,30 @@ def print_scores(client, topic_list, payload):
     print("")
 
 
+def set_board(client, topic_list, payload):
+    # Sent once when the game starts, before the first game_state
+    board.update(json.loads(payload))
+
+
 def print_game_state(client, topic_list, payload):
     state = json.loads(payload)
     # print(state)
-    my_map = [[None for _ in range(5)] for _ in range(5)]
+    radius, height, width = board['vision_radius'], board['height'], board['width']
+    size = 2 * radius + 1
+    my_map = [[None for _ in range(size)] for _ in range(size)]
 
     playerpos = state["currentPosition"]
 
     def translate_pos(pos):
-        return (pos[0] - playerpos[0] + 2, pos[1] - playerpos[1] + 2)
+        return (pos[0] - playerpos[0] + radius, pos[1] - playerpos[1] + radius)
 
     def translate_pos_inv(pos):
-        return (playerpos[0] - 2 + pos[0], playerpos[1] - 2 + pos[1])
+        return (playerpos[0] - radius + pos[0], playerpos[1] - radius + pos[1])
 
     def within_range(pos):
-        return 0 <= pos[0] < 5 and 0 <= pos[1] < 5
+        return 0 <= pos[0] < size and 0 <= pos[1] < size
 
-    my_map[2][2] = 6  # player position
+    my_map[radius][radius] = 6  # player position
 
     for i, set1 in enumerate(["enemyPositions", "coin1", "coin2", "coin3", "walls", "teammatePositions"]):
         for a in state[set1]:
@@ -64,10 +71,10 @@ def print_game_state(client, topic_list, payload):
             if within_range(a):
                 my_map[a[0]][a[1]] = i
 
-    for y in range(5):
-        for x in range(5):
+    for y in range(size):
+        for x in range(size):
             game_pos = translate_pos_inv((y, x))
-            if game_pos[0] < 0 or game_pos[0] > 9 or game_pos[1] < 0 or game_pos[1] > 9:
+            if game_pos[0] < 0 or game_pos[0] >= height or game_pos[1] < 0 or game_pos[1] >= width:
                 dat = 4
             else:
                 dat = my_map[y][x]
@@ -97,6 +104,7 @@ def print_msg(client, topic_list, payload):
         print(f"[{data['player_name']}]: {data['message']}")
 
 game_finished = False
+board = {'height': 10, 'width': 10, 'vision_radius': 2}  # replaced by the lobby's board message
 def handle_server_messages(client, topic_list, payload):
     msg = payload.decode('utf8')
     if msg == "Game Over: All coins have been collected":
@@ -108,6 +116,7 @@ def handle_server_messages(client, topic_list, payload):
 
 dispatch = {
     'lobby': handle_server_messages,
+    'board': set_board,
     'game_state': print_game_state,
     'scores': print_scores,
     'comms': print_msg,
@@ -143,6 +152,7 @@ if __name__ == '__main__':
     client.loop_start()
 
     client.subscribe(f"games/{lobby_name}/lobby")  # error messages
+    client.subscribe(f'games/{lobby_name}/board')  # board size and vision radius
     client.subscribe(f'games/{lobby_name}/{player_name}/game_state')  # print board
     client.subscribe(f'games/{lobby_name}/scores')  # print current scores
     client.subscribe(f"games/{lobby_name}/{team_name}/comms")
@@ -1,15 +1,20 @@
 import os
 import json
-import copy
-from collections import OrderedDict
+import threading
+from functools import partial
 
 import paho.mqtt.client as paho
 from paho import mqtt
 from dotenv import load_dotenv
 
-from InputTypes import NewPlayer
+from InputTypes import NewPlayer, LobbyConfig
 from game import Game
+from mapPool import MapPool
+from replay import open_replay
 from moveset import Moveset
+from stateDelta import make_keyframe, diff_game_data
+from turnTimer import TurnTimer
+from wireFormat import encode_game_state, encode_map_info, encode_scores
 
 # setting callbacks for different events to see if it works, print the message etc.
 def on_connect(client, userdata, flags, rc, properties=None):
@@ -59,11 +64,15 @@ def on_message(client, userdata, msg):
     """
     print("message: " + msg.topic + " " + str(msg.qos) + " " + str(msg.payload))
     topic_list = msg.topic.split("/")
+    handle_message(client, topic_list, msg.payload)
 
-    # Validate it is input we can deal with
-    if topic_list[-1] in dispatch.keys(): 
-        dispatch[topic_list[-1]](client, topic_list, msg.payload)
 
+def handle_message(client, topic_list, msg_payload):
+    # Validate it is input we can deal with
+    if topic_list[-1] in dispatch.keys():
+        # Turn deadlines fire on the timer thread, only one of them may touch the lobbies at a time
+        with client.game_lock:
+            dispatch[topic_list[-1]](client, topic_list, msg_payload)
 
 
 # Dispatched function, adds player to a lobby & team
@@ -108,64 +117,217 @@ def player_move(client, topic_list, msg_payload):
     lobby_name = topic_list[1]
     player_name = topic_list[2]
     if lobby_name in client.team_dict.keys():
-        try:
-            new_move = msg_payload.decode()
-
-            client.move_dict[lobby_name][player_name] = (player_name, move_to_Moveset[new_move])
-            game: Game = client.game_dict[lobby_name]
-
-            # If all players made a move, resolve movement
-            if len(game.all_players) == len(client.move_dict[lobby_name]):
-                for player, move in client.move_dict[lobby_name].values():
-                    game.movePlayer(player, move)
-
-                # Publish player states after all movement is resolved
-                for player, _ in client.move_dict[lobby_name].values():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
-
-                # Clear move list
-                client.move_dict[lobby_name].clear()
-                print(game.map)
-                client.publish(f'games/{lobby_name}/scores', json.dumps(game.getScores()))
-                if game.gameOver():
-                    # Publish game over, remove game
-                    publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
-                    client.team_dict.pop(lobby_name)
-                    client.move_dict.pop(lobby_name)
-                    client.game_dict.pop(lobby_name)
-
-        except Exception as e:
-            raise e
-            publish_error_to_lobby(client, lobby_name, e.__str__)
+        new_move = msg_payload.decode(errors='replace')
+
+        if lobby_name not in client.game_dict.keys():
+            publish_error_to_lobby(client, lobby_name, "Game has not started yet.")
+            return
+        game: Game = client.game_dict[lobby_name]
+        if player_name not in game.all_players.keys():
+            publish_error_to_lobby(client, lobby_name, f"{player_name} is not in this game.")
+            return
+        if new_move not in move_to_Moveset:
+            publish_error_to_lobby(client, lobby_name, f"{new_move} is not a valid move.")
+            return
+
+        client.move_dict[lobby_name][player_name] = move_to_Moveset[new_move]
+
+        # If all players made a move, resolve movement
+        if len(game.all_players) == len(client.move_dict[lobby_name]):
+            resolve_turn(client, lobby_name)
     else:
         publish_error_to_lobby(client, lobby_name, "Lobby name not found.")
 
 
+def resolve_turn(client, lobby_name):
+    game: Game = client.game_dict[lobby_name]
+    if lobby_name in client.replay_dict:
+        client.replay_dict[lobby_name].turn(client.move_dict[lobby_name])
+    # player_move only stores known players and moves
+    game.resolveTurn(client.move_dict[lobby_name], checked=False)
+
+    # Publish player states after all movement is resolved, players who didn't move may still see changes
+    for player in game.all_players.keys():
+        publish_game_state(client, lobby_name, player)
+
+    # Clear move list
+    if client.move_dict[lobby_name]:
+        client.idle_dict.pop(lobby_name, None)
+    client.move_dict[lobby_name].clear()
+    print_board(game)
+    config = client.config_dict.get(lobby_name, DEFAULT_CONFIG)
+    client.publish(f'games/{lobby_name}/scores', encode_scores(game.getScores(), config.encoding))
+    if game.gameOver():
+        # Publish game over, remove game
+        if lobby_name in client.replay_dict:
+            client.replay_dict.pop(lobby_name).end(game.getScores())
+        publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
+        remove_lobby(client, lobby_name)
+    else:
+        start_turn(client, lobby_name)
+
+
+def start_turn(client, lobby_name):
+    turn = client.turn_dict.get(lobby_name, 0) + 1
+    client.turn_dict[lobby_name] = turn
+    config = client.config_dict.get(lobby_name, DEFAULT_CONFIG)
+    if config.turn_timeout is not None:
+        client.turn_timer.schedule(lobby_name, config.turn_timeout, partial(turn_deadline, client, lobby_name, turn))
+
+
+def turn_deadline(client, lobby_name, turn):
+    """
+        Resolves a turn with the moves that arrived before its deadline, players without a move stay put
+        :param turn: the turn the deadline was set for, a deadline that lost the race with the last move is ignored
+    """
+    with client.game_lock:
+        if client.turn_dict.get(lobby_name) != turn:
+            return
+        if not client.move_dict[lobby_name]:
+            # A turn may pass with nobody moving, but after enough of them nobody is playing anymore
+            idle = client.idle_dict.get(lobby_name, 0) + 1
+            if idle >= client.config_dict.get(lobby_name, DEFAULT_CONFIG).idle_turn_limit:
+                publish_to_lobby(client, lobby_name, "Game Over: No moves received for too many turns")
+                remove_lobby(client, lobby_name)
+                return
+            client.idle_dict[lobby_name] = idle
+        resolve_turn(client, lobby_name)
+
+
 # Dispatched function: Instantiates Game object
 def start_game(client, topic_list, msg_payload):
     lobby_name = topic_list[1]
     if isinstance(msg_payload, bytes) and msg_payload.decode() == "START":
 
         if lobby_name in client.team_dict.keys():
-                # create new game
-                dict_copy = copy.deepcopy(client.team_dict[lobby_name])
-                dict_copy.pop('started')
+                if lobby_name in client.pending_starts:
+                    # Already waiting for its board
+                    return
+                # create new game on a pre-generated layout, only the players are placed here
+                config = client.config_dict.get(lobby_name, DEFAULT_CONFIG)
+                layout = client.map_pool.take(config.height, config.width, on_ready=partial(layout_ready, client, lobby_name))
+                if layout is None:
+                    # Too big to build under the game lock, the pool builds it in the background and
+                    # the game starts when it is handed over
+                    client.pending_starts.add(lobby_name)
+                    publish_to_lobby(client, lobby_name, "Board is being generated, the game starts when it is ready.")
+                    return
+                begin_game(client, lobby_name, layout)
+    elif isinstance(msg_payload, bytes) and msg_payload.decode() == "STOP":
+        publish_to_lobby(client, lobby_name, "Game Over: Game has been stopped")
+        remove_lobby(client, lobby_name)
 
-                game = Game(dict_copy)
-                client.game_dict[lobby_name] = game
-                client.move_dict[lobby_name] = OrderedDict()
-                client.team_dict[lobby_name]["started"] = True
 
-                for player in game.all_players.keys():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
+def layout_ready(client, lobby_name, layout):
+    """
+        Runs on the map pool's thread with the layout of a start that was waiting for one, the game
+        starts where the lobby's deadlines run
+    """
+    client.turn_timer.schedule(lobby_name, 0, partial(deferred_start, client, lobby_name, layout))
+
+
+def deferred_start(client, lobby_name, layout):
+    with client.game_lock:
+        # The lobby may have been stopped while its board was built
+        if lobby_name not in client.pending_starts:
+            return
+        client.pending_starts.discard(lobby_name)
+        begin_game(client, lobby_name, layout)
+
+
+def begin_game(client, lobby_name, layout):
+    teams = {team: players for team, players in client.team_dict[lobby_name].items() if team != 'started'}
+    config = client.config_dict.get(lobby_name, DEFAULT_CONFIG)
+    game = Game(teams, layout=layout)
+    client.game_dict[lobby_name] = game
+    if lobby_name in client.replay_dict:
+        # START again restarts the game, the old log ends unfinished
+        client.replay_dict.pop(lobby_name).close()
+    if client.replay_dir:
+        # The layout's seed rebuilds the same map, players included
+        path = os.path.join(client.replay_dir, f'{lobby_name}-{layout.seed:016x}.replay')
+        client.replay_dict[lobby_name] = open_replay(path, layout.seed, teams, config.height, config.width)
+    client.move_dict[lobby_name] = {}
+    client.state_dict[lobby_name] = {}
+    client.team_dict[lobby_name]["started"] = True
+
+    # Clients size their boards and views from this, it comes before the first game_state
+    client.publish(f'games/{lobby_name}/board', json.dumps({'height': config.height,
+                                                          'width': config.width,
+                                                          'vision_radius': config.vision_radius}))
+    if config.map_info:
+        client.publish(f'games/{lobby_name}/map_info',
+                       encode_map_info(config.height, config.width, game.map.wallMask(), config.encoding))
+    for player in game.all_players.keys():
+        publish_game_state(client, lobby_name, player)
+    start_turn(client, lobby_name)
+
+    print_board(game)
+
+
+# Dispatched function: sets lobby options, only allowed before the game starts
+def configure_lobby(client, topic_list, msg_payload):
+    lobby_name = topic_list[1]
+    try:
+        config = LobbyConfig(**json.loads(msg_payload))
+    except:
+        print("ValidationError in configure_lobby")
+        return
 
+    if lobby_name in client.game_dict.keys() or lobby_name in client.pending_starts:
+        publish_error_to_lobby(client, lobby_name, "Game has already started, lobby config can't be changed")
+        return
+
+    client.config_dict[lobby_name] = config
+    if lobby_name not in client.team_dict:
+        # Nothing else would ever drop the config of a lobby nobody joins
+        client.turn_timer.schedule((lobby_name, 'config'), CONFIG_TIMEOUT, partial(expire_config, client, lobby_name))
 
-                print(game.map)
-    elif isinstance(msg_payload, bytes) and msg_payload.decode() == "STOP":
-        publish_to_lobby(client, lobby_name, "Game Over: Game has been stopped")
-        client.team_dict.pop(lobby_name, None)
-        client.move_dict.pop(lobby_name, None)
-        client.game_dict.pop(lobby_name, None)
+
+def expire_config(client, lobby_name):
+    with client.game_lock:
+        if lobby_name not in client.team_dict:
+            client.config_dict.pop(lobby_name, None)
+
+
+def print_board(game):
+    # Printing takes longer than a turn on big boards, those only print their size
+    if game.map.height * game.map.width <= PRINT_BOARD_CELLS:
+        print(game.map)
+    else:
+        print(f'{game.map.height}x{game.map.width} board, {game.map.numCoins} coins left')
+
+
+def publish_game_state(client, lobby_name, player):
+    config = client.config_dict.get(lobby_name, DEFAULT_CONFIG)
+    game_data = client.game_dict[lobby_name].getGameData(player, config.vision_radius, checked=False)
+
+    # In delta mode only send what changed since the last state, with a full keyframe every few turns
+    if config.delta:
+        previous, sent = client.state_dict[lobby_name].get(player, (None, 0))
+        if sent % config.keyframe_interval == 0:
+            message = make_keyframe(game_data)
+        else:
+            message = diff_game_data(previous, game_data)
+        client.state_dict[lobby_name][player] = (game_data, sent + 1)
+    else:
+        message = game_data
+
+    client.publish(f'games/{lobby_name}/{player}/game_state', encode_game_state(message, config.encoding))
+
+
+def remove_lobby(client, lobby_name):
+    client.team_dict.pop(lobby_name, None)
+    client.move_dict.pop(lobby_name, None)
+    client.game_dict.pop(lobby_name, None)
+    client.config_dict.pop(lobby_name, None)
+    client.state_dict.pop(lobby_name, None)
+    client.idle_dict.pop(lobby_name, None)
+    if lobby_name in client.replay_dict:
+        client.replay_dict.pop(lobby_name).close()
+    if client.turn_dict.pop(lobby_name, None) is not None or lobby_name in client.pending_starts:
+        client.turn_timer.cancel(lobby_name)
+    client.pending_starts.discard(lobby_name)
 
 
 def publish_error_to_lobby(client, lobby_name, error):
@@ -180,8 +342,43 @@ dispatch = {
     'new_game' : add_player,
     'move' : player_move,
     'start' : start_game,
+    'config' : configure_lobby,
 }
 
+# Topics the server listens on, the last level picks the dispatched function
+server_topics = ["new_game", 'games/+/start', 'games/+/+/move', 'games/+/config']
+
+DEFAULT_CONFIG = LobbyConfig()
+
+PRINT_BOARD_CELLS = 400  # largest board printed to the console every turn
+
+CONFIG_TIMEOUT = 300  # seconds the config of a lobby nobody has joined is kept
+
+
+def init_lobby_state(client, turn_timer=None, replay_dir=None, map_pool=None):
+    """
+        Attaches the lobby bookkeeping used by the dispatched functions
+        :param client: the paho client, or any object with a publish(topic, payload) method
+        :param turn_timer: object with schedule(key, delay, callback) and cancel(key) running turn
+            deadlines, a new TurnTimer by default
+        :param replay_dir: directory every game's replay log is written to, REPLAY_DIR from the
+            environment by default, no logs when neither is set
+        :param map_pool: MapPool games are started from, a new one configured from the environment by default
+    """
+    client.team_dict = {} # Keeps tracks of players before a game starts {'lobby_name' : {'team_name' : [player_name, ...]}}
+    client.game_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
+    client.move_dict = {} # Moves sent this turn {'lobby_name' : {'player_name' : Moveset}}
+    client.config_dict = {} # Lobby options sent before start {'lobby_name' : LobbyConfig}
+    client.state_dict = {} # Last game_state sent in delta mode {'lobby_name' : {'player_name' : (game_data, sent_count)}}
+    client.turn_dict = {} # Current turn number of each running game {'lobby_name' : int}
+    client.idle_dict = {} # Turns in a row that reached their deadline without a move {'lobby_name' : int}
+    client.replay_dict = {} # Replay log of each running game {'lobby_name' : ReplayWriter}
+    client.pending_starts = set() # Lobbies sent START whose board the map pool is still building {'lobby_name', ...}
+    client.replay_dir = os.environ.get('REPLAY_DIR') if replay_dir is None else replay_dir
+    client.turn_timer = TurnTimer() if turn_timer is None else turn_timer
+    client.map_pool = MapPool.from_env() if map_pool is None else map_pool
+    client.game_lock = threading.RLock()
+
 
 if __name__ == '__main__':
     load_dotenv(dotenv_path='./credentials.env')
@@ -206,12 +403,9 @@ if __name__ == '__main__':
     client.on_publish = on_publish # Can comment out to not print when publishing to topics
     
     # custom dictionary to track players
-    client.team_dict = {} # Keeps tracks of players before a game starts {'lobby_name' : {'team_name' : [player_name, ...]}}
-    client.game_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
-    client.move_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
+    init_lobby_state(client)
 
-    client.subscribe("new_game")
-    client.subscribe('games/+/start')
-    client.subscribe('games/+/+/move')
+    for topic in server_topics:
+        client.subscribe(topic)
 
     client.loop_forever()
@@ -1,64 +1,162 @@
 import os
-import json
+import threading
+import traceback
+from queue import SimpleQueue, Empty
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import paho.mqtt.client as paho
 from paho import mqtt
 from dotenv import load_dotenv
-from pydantic import ValidationError
 
-from InputTypes import NewPlayer, Move
-from game import Game
+import GameClient
+from ShardedGameClient import lobby_of
+from turnTimer import TurnTimer
+from mapPool import MapPool
 
 
-# Global Variables
-load_dotenv(dotenv_path='./credentials.env')
+class GameInstanceManager():
+    """
+    Per-lobby actor. Messages for the lobby are queued in its mailbox and handled one at a time
+    on a shared executor, so a lobby owns no thread or connection of its own while idle.
+    """
+
+    def __init__(self, lobby_name: str, pool: "LobbyPool"):
+        self.lobby_name = lobby_name
+        self.pool = pool
+        GameClient.init_lobby_state(self, turn_timer=self, map_pool=pool.map_pool)
+        self.mailbox = SimpleQueue()
+        self.lock = threading.Lock()
+        self.scheduled = False
 
-broker_address = os.environ.get('BROKER_ADDRESS')
-broker_port = int(os.environ.get('BROKER_PORT'))
-username = os.environ.get('USERNAME')
-password = os.environ.get('PASSWORD')
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        # Lets the GameClient dispatch functions publish through the shared connection
+        return self.pool.client.publish(topic, payload, qos, retain)
 
+    def schedule(self, key, delay, callback):
+        # Deadlines come back through the mailbox so they run on the actor like any message
+        self.pool.turn_timer.schedule(key, delay, partial(self.post, None, callback))
 
-def on_message(self, client, userdata, msg):
+    def cancel(self, key):
+        self.pool.turn_timer.cancel(key)
+
+    def post(self, topic_list, msg_payload):
         """
-        Prints a mqtt message to stdout ( used as callback for subscribe )
-        :param client: the client itself
-        :param userdata: userdata is set when initiating the client, here it is userdata=None
-        :param msg: the message with topic and payload
+            Queues a message for the lobby and schedules the actor if it is idle
+            :param topic_list: the message topic split on "/", None to run msg_payload() on the actor
+            :param msg_payload: the raw message payload
         """
-        pass
+        self.mailbox.put((topic_list, msg_payload))
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.pool.executor.submit(self.run)
 
+    def run(self):
+        try:
+            while True:
+                try:
+                    topic_list, msg_payload = self.mailbox.get_nowait()
+                except Empty:
+                    with self.lock:
+                        if self.mailbox.empty():
+                            return
+                    continue
 
-class GameInstanceManager():
-    def __init__(self, lobby_name: str, team_dict: dict[str,list[str]]):
+                # A message that fails is dropped, the lobby keeps handling the ones after it
+                try:
+                    if topic_list is None:
+                        msg_payload()
+                    else:
+                        GameClient.handle_message(self, topic_list, msg_payload)
+                except Exception:
+                    print(f"Dropped a message for lobby {self.lobby_name}:")
+                    traceback.print_exc()
+
+                # The dispatched functions drop the lobby once its game is over or stopped, or its config expires
+                if self.lobby_name not in self.team_dict and self.lobby_name not in self.config_dict:
+                    self.pool.close(self)
+        finally:
+            with self.lock:
+                self.scheduled = False
+                # A message posted after the last get found the actor still scheduled, pick it up
+                if not self.mailbox.empty():
+                    self.scheduled = True
+                    self.pool.executor.submit(self.run)
+
+
+class LobbyPool:
+    """
+    Hosts every lobby behind a single broker connection, a fixed pool of worker threads, one turn timer
+    and one map pool
+    """
+
+    def __init__(self, client, max_workers=None):
         """
-        Creates a new client to handle each game
+            :param client: the shared paho client, or any object with a publish(topic, payload) method
+            :param max_workers: threads shared by all lobbies
         """
-        # initialize new client
-        self.client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id=lobby_name, userdata=None, protocol=paho.MQTTv5)
-        # enable TLS for secure connection
-        self.client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-        # set username and password
-        self.client.username_pw_set(username, password)
-        # connect to HiveMQ Cloud on port 8883 (default for MQTT)
-        self.client.connect(broker_address, broker_port)
-        # handles subscription
-        self.client.on_message = self.on_message
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.turn_timer = TurnTimer()
+        self.map_pool = MapPool.from_env()
+        self.lobbies: dict[str, GameInstanceManager] = {}
+        self.lock = threading.Lock()
 
-        # subscribes to player movement topics
-        for team in team_dict.keys():
-             for player in team_dict[team]:  
-                self.client.subscribe(f"games/{lobby_name}/{player}/move")
+    def route(self, topic, msg_payload):
+        topic_list = topic.split("/")
+        lobby_name = lobby_of(topic_list, msg_payload)
+        if lobby_name is None:
+            return
+        # Posting under the pool lock means a lobby can't be closed with a message on its way in
+        with self.lock:
+            manager = self.lobbies.get(lobby_name)
+            if manager is None:
+                manager = self.lobbies[lobby_name] = GameInstanceManager(lobby_name, self)
+            manager.post(topic_list, msg_payload)
 
-    def start(self):
-        self.client.loop_start()
+    def close(self, manager: GameInstanceManager):
+        with self.lock:
+            # Messages still queued will bring the lobby back, let the actor handle them first
+            if manager.mailbox.empty() and self.lobbies.get(manager.lobby_name) is manager:
+                del self.lobbies[manager.lobby_name]
 
-    def __del__(self):
-        self.client.loop_stop()
-        self.client.disconnect()
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
 
+    def on_message(self, client, userdata, msg):
+        """
+            Routes a message to its lobby's actor ( used as callback for subscribe )
+            :param client: the client itself
+            :param userdata: userdata is set when initiating the client, here it is userdata=None
+            :param msg: the message with topic and payload
+        """
+        self.route(msg.topic, msg.payload)
 
-    
 
 if __name__ == "__main__":
-    game = GameInstanceManager()
+    load_dotenv(dotenv_path='./credentials.env')
+
+    broker_address = os.environ.get('BROKER_ADDRESS')
+    broker_port = int(os.environ.get('BROKER_PORT'))
+    username = os.environ.get('USER_NAME')
+    password = os.environ.get('PASSWORD')
+
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="GameClient", userdata=None, protocol=paho.MQTTv5)
+    # enable TLS for secure connection
+    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # set username and password
+    client.username_pw_set(username, password)
+    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
+    client.connect(broker_address, broker_port)
+
+    pool = LobbyPool(client)
+    client.on_subscribe = GameClient.on_subscribe
+    client.on_message = pool.on_message
+
+    # One set of wildcard subscriptions covers every lobby
+    for topic in GameClient.server_topics:
+        client.subscribe(topic)
+
+    client.loop_forever()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 class NewPlayer(BaseModel):
@@ -10,3 +12,14 @@ class Move(BaseModel):
 
 class Start(BaseModel):
     start: str = Field(..., pattern=r'^(START)$')
+
+class LobbyConfig(BaseModel):
+    delta: bool = False  # publish game_state as diffs against the previous state
+    keyframe_interval: int = Field(10, ge=1)  # every n-th game_state is a full snapshot in delta mode
+    turn_timeout: Optional[float] = Field(None, gt=0)  # seconds before a turn resolves without the missing moves
+    idle_turn_limit: int = Field(3, ge=1)  # turns in a row without any move before the lobby is closed
+    encoding: str = Field('json', pattern=r'^(json|binary)$')  # wire format of game_state and scores, see wireFormat
+    map_info: bool = False  # publish the board size and walls once when the game starts, see wireFormat.encode_map_info
+    height: int = Field(10, ge=5, le=4096)  # board rows
+    width: int = Field(10, ge=5, le=4096)  # board columns
+    vision_radius: int = Field(2, ge=1, le=100)  # players see the (2r+1)^2 cells around them
@@ -6,6 +6,9 @@ import paho.mqtt.client as paho
 from paho import mqtt
 import time
 
+from botClient import StateInbox
+from wireFormat import decode_game_state
+
 
 # setting callbacks for different events to see if it works, print the message etc.
 def on_connect(client, userdata, flags, rc, properties=None):
@@ -56,6 +59,18 @@ def on_message(client, userdata, msg):
 
     print("message: " + msg.topic + " " + str(msg.qos) + " " + str(msg.payload))
 
+    topic_list = msg.topic.split("/")
+    if topic_list[-1] == 'game_state':
+        # Rebuild the full state when the lobby sends deltas
+        player_name = topic_list[2]
+        state = game_states.put(player_name, decode_game_state(msg.payload))
+        if state is not None:
+            print(f"{player_name} state: {state}")
+
+
+# Filled from the network thread, next_state(player_name) waits for a player's next state
+game_states = StateInbox()
+
 
 if __name__ == '__main__':
     load_dotenv(dotenv_path='./credentials.env')
@@ -84,7 +99,10 @@ if __name__ == '__main__':
     player_2 = "Player2"
     player_3 = "Player3"
 
+    client.publish(f"games/{lobby_name}/config", json.dumps({'delta': True}))
+
     client.subscribe(f"games/{lobby_name}/lobby")
+    client.subscribe(f"games/{lobby_name}/board")
     client.subscribe(f'games/{lobby_name}/+/game_state')
     client.subscribe(f'games/{lobby_name}/scores')
 
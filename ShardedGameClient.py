@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import threading
+import traceback
+import zlib
+import multiprocessing
+from functools import partial
+
+import paho.mqtt.client as paho
+from paho import mqtt
+from dotenv import load_dotenv
+
+import GameClient
+from turnTimer import TurnTimer
+
+
+def lobby_of(topic_list, msg_payload):
+    """
+        Finds the lobby a server message belongs to
+        :param topic_list: the message topic split on "/"
+        :param msg_payload: the raw message payload
+        :return: the lobby name, None if it can't be read from the message
+    """
+    if topic_list[0] == 'new_game':
+        # New players name their lobby in the payload
+        try:
+            return json.loads(msg_payload)['lobby_name']
+        except:
+            return None
+    return topic_list[1] if len(topic_list) > 2 else None
+
+
+def shard_for(lobby_name, num_workers):
+    # crc32 rather than hash() so every process maps a lobby to the same worker
+    return zlib.crc32(lobby_name.encode()) % num_workers
+
+
+class LobbyShard:
+    """
+    Stands in for the paho client inside a worker, so the GameClient dispatch functions run
+    unchanged. Publishes are collected and shipped back to the front-end in one batch per message.
+    """
+
+    def __init__(self, outbox_queue):
+        self.timer = TurnTimer()
+        GameClient.init_lobby_state(self, turn_timer=self)
+        self.outbox = []
+        self.outbox_queue = outbox_queue
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.outbox.append((topic, payload))
+
+    def flush(self):
+        if self.outbox:
+            self.outbox_queue.put(self.outbox)
+            self.outbox = []
+
+    def schedule(self, key, delay, callback):
+        self.timer.schedule(key, delay, partial(self.fire, callback))
+
+    def cancel(self, key):
+        self.timer.cancel(key)
+
+    def fire(self, callback):
+        # Deadlines publish from the timer thread, ship their output without waiting for a message
+        with self.game_lock:
+            callback()
+            self.flush()
+
+
+def shard_worker(inbox, outbox, quiet=False):
+    """
+        Worker process main loop, owns the Game objects of every lobby hashed to it
+        :param inbox: queue of (topic, payload) messages, None stops the worker
+        :param outbox: queue the worker puts lists of (topic, payload) publishes on
+        :param quiet: silence the per turn prints of the dispatched functions
+    """
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    shard = LobbyShard(outbox)
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        topic, payload = message
+        with shard.game_lock:
+            # A message that fails is dropped, the shard's other lobbies keep running
+            try:
+                GameClient.handle_message(shard, topic.split("/"), payload)
+            except Exception:
+                print(f"Dropped message on {topic}:", file=sys.stderr)
+                traceback.print_exc()
+            shard.flush()
+
+
+class ShardedGameServer:
+    """
+    Routes server messages to worker processes by lobby name and fans their publishes back out.
+    The front-end keeps no game state, every lobby lives in exactly one worker.
+    """
+
+    def __init__(self, publish, num_workers=None, quiet=False):
+        """
+            :param publish: callable(topic, payload) used to send worker output, e.g. client.publish
+            :param num_workers: number of worker processes, defaults to the cpu count
+            :param quiet: silence the per turn prints of the workers
+        """
+        self.publish = publish
+        self.num_workers = num_workers or os.cpu_count()
+        self.quiet = quiet
+        self.inboxes = []
+        self.workers = []
+        self.outbox = None
+        self.fanout = None
+
+    def start(self):
+        # Start the workers before any network threads exist in this process
+        self.outbox = multiprocessing.Queue()
+        for _ in range(self.num_workers):
+            inbox = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=shard_worker, args=(inbox, self.outbox, self.quiet), daemon=True)
+            worker.start()
+            self.inboxes.append(inbox)
+            self.workers.append(worker)
+
+        self.fanout = threading.Thread(target=self.fan_out, daemon=True)
+        self.fanout.start()
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.outbox.put(None)
+        self.fanout.join()
+        self.inboxes.clear()
+        self.workers.clear()
+
+    def route(self, topic, payload):
+        lobby_name = lobby_of(topic.split("/"), payload)
+        # Messages without a readable lobby can only be rejected, any worker will do
+        shard = 0 if lobby_name is None else shard_for(lobby_name, self.num_workers)
+        self.inboxes[shard].put((topic, payload))
+
+    def fan_out(self):
+        while True:
+            batch = self.outbox.get()
+            if batch is None:
+                break
+            for topic, payload in batch:
+                self.publish(topic, payload)
+
+    def on_message(self, client, userdata, msg):
+        """
+            Routes a message to its lobby's worker ( used as callback for subscribe )
+            :param client: the client itself
+            :param userdata: userdata is set when initiating the client, here it is userdata=None
+            :param msg: the message with topic and payload
+        """
+        self.route(msg.topic, msg.payload)
+
+
+if __name__ == '__main__':
+    load_dotenv(dotenv_path='./credentials.env')
+
+    broker_address = os.environ.get('BROKER_ADDRESS')
+    broker_port = int(os.environ.get('BROKER_PORT'))
+    username = os.environ.get('USER_NAME')
+    password = os.environ.get('PASSWORD')
+    num_workers = int(os.environ.get('GAME_WORKERS', os.cpu_count()))
+
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="GameClient", userdata=None, protocol=paho.MQTTv5)
+
+    server = ShardedGameServer(client.publish, num_workers)
+    server.start()
+
+    # enable TLS for secure connection
+    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # set username and password
+    client.username_pw_set(username, password)
+    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
+    client.connect(broker_address, broker_port)
+
+    client.on_subscribe = GameClient.on_subscribe
+    client.on_message = server.on_message
+
+    for topic in GameClient.server_topics:
+        client.subscribe(topic)
+
+    client.loop_forever()
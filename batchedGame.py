@@ -0,0 +1,138 @@
+from array import array
+
+from game import Game
+from gameItems import *
+
+
+class BatchedGame:
+    """
+    N games with the same board size and teams, stored as flat arrays instead of object graphs:
+    all boards' cell codes in one bytearray, every player's cell index, team scores and coin counts.
+    A whole turn for every game is applied by one call to step().
+    """
+
+    def __init__(self, height: int, width: int, teamNames: list[str], playerNames: list[str], playerTeams: list[int],
+                 cells: bytearray, positions: array, scores: array, coins: array):
+        self.__height = height
+        self.__width = width
+        self.teamNames = teamNames
+        self.playerNames = playerNames
+        self.__playerTeams = playerTeams
+        self.__claimOrder = sorted(range(len(playerNames)), key=playerNames.__getitem__)  # resolveTurn's name order
+        self.__cells = cells          # numGames * height * width cell codes
+        self.__positions = positions  # numGames * numPlayers cell indexes within their board
+        self.__scores = scores        # numGames * numTeams
+        self.__coins = coins          # numGames coins left
+        self.numGames = len(coins)
+
+    @classmethod
+    def fromGames(cls, games: list[Game]) -> 'BatchedGame':
+        """
+        Copies the current state of games, which must share board size, team names and player names
+        """
+        first = games[0]
+        height, width = first.map.height, first.map.width
+        teamNames = list(first.teams)
+        playerNames = list(first.all_players)
+        playerTeams = [teamNames.index(player.team.name) for player in first.all_players.values()]
+
+        cells = bytearray()
+        positions, scores, coins = array('l'), array('l'), array('l')
+        for game in games:
+            assert (game.map.height, game.map.width) == (height, width) and list(game.all_players) == playerNames
+            cells += game.map.map.codes.tobytes()
+            positions.extend(x * width + y for x, y in (player.loc for player in game.all_players.values()))
+            scores.extend(game.teams[name].score for name in teamNames)
+            coins.append(game.map.numCoins)
+        return cls(height, width, teamNames, playerNames, playerTeams, cells, positions, scores, coins)
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def width(self):
+        return self.__width
+
+    def step(self, moves: list):
+        """
+        Applies one turn to every game that isn't over, with the same outcome as Game.resolveTurn:
+        claims go by player name, followers may move into a cell its occupant leaves, swaps and
+        cycles stay put
+        :param moves: numGames * numPlayers Moveset or None, game by game in playerNames order
+        """
+        cells, positions, scores, coins = self.__cells, self.__positions, self.__scores, self.__coins
+        playerTeams, claimOrder = self.__playerTeams, self.__claimOrder
+        height, width = self.__height, self.__width
+        area = height * width
+        numPlayers, numTeams = len(self.playerNames), len(self.teamNames)
+
+        for g in range(self.numGames):
+            if coins[g] <= 0:
+                continue
+            board = g * area
+            first = g * numPlayers
+            targets = {}  # cell -> player index that gets to move there
+            for p in claimOrder:
+                move = moves[first + p]
+                if move is None:
+                    continue
+                dx, dy = move.value
+                x, y = divmod(positions[first + p], width)
+                x, y = x + dx, y + dy
+                if not (0 <= x < height and 0 <= y < width):
+                    continue
+                new = x * width + y
+                if cells[board + new] != WALL and new not in targets:
+                    targets[new] = p
+            if not targets:
+                continue
+            wanted = {p: new for new, p in targets.items()}
+            occupants = {positions[first + p]: p for p in range(numPlayers)}
+
+            # Same chain following as Game.resolveTurn, moved[p] is None while its chain is followed
+            moved = {}
+            order = []
+            for p in wanted:
+                chain = []
+                occupant = p
+                while occupant in wanted and occupant not in moved:
+                    moved[occupant] = None
+                    chain.append(occupant)
+                    occupant = occupants.get(wanted[occupant])
+                moving = occupant is None or bool(moved.get(occupant))
+                for mover in chain:
+                    moved[mover] = moving
+                if moving:
+                    order.extend(reversed(chain))
+
+            for p in order:
+                new = wanted[p]
+                code = cells[board + new]
+                if code != EMPTY:
+                    scores[g * numTeams + playerTeams[p]] += COIN_VALUES[code]
+                    coins[g] -= 1
+                cells[board + positions[first + p]] = EMPTY
+                cells[board + new] = PLAYER
+                positions[first + p] = new
+
+    def gameOver(self, game: int) -> bool:
+        return self.__coins[game] <= 0
+
+    def numCoins(self, game: int) -> int:
+        return self.__coins[game]
+
+    def getScores(self, game: int) -> dict[str, int]:
+        numTeams = len(self.teamNames)
+        return dict(zip(self.teamNames, self.__scores[game * numTeams:(game + 1) * numTeams]))
+
+    def playerLoc(self, game: int, playerName: str) -> tuple[int, int]:
+        idx = self.__positions[game * len(self.playerNames) + self.playerNames.index(playerName)]
+        return divmod(idx, self.__width)
+
+    def codes(self, game: int) -> memoryview:
+        """
+        Read-only cell codes of one board, index with codes[x, y]
+        """
+        area = self.__height * self.__width
+        return memoryview(self.__cells)[game * area:(game + 1) * area].toreadonly().cast('B', (self.__height, self.__width))
@@ -0,0 +1,891 @@
+"""
+Engine benchmarks, run with: python benchmark.py [name ...]
+Runs every benchmark when no names are given.
+"""
+
+import contextlib
+import io
+import json
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from typing import Optional
+
+from game import Game
+from gameItems import *
+from map import Map, getDefaultWallChoices
+from player import Player
+
+
+def timePerCall(fn, repeat: int = 5, number: int = 200) -> float:
+    """
+    Best wall time of a single fn() call over repeat batches of number calls, in microseconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def makeLobby(width: int = 50, height: int = 50, seed: int = 1) -> Game:
+    return Game({'TeamA': ['A1', 'A2'], 'TeamB': ['B1', 'B2']}, width, height, seed=seed)
+
+
+def legacyGameData(game: Game, playerName: str, visionRadius: int) -> dict:
+    """
+    Per-cell Map.get + isinstance reference implementation of Game.getGameData
+    """
+    player = game.getPlayer(playerName)
+    centerX, centerY = player.loc
+    minX, maxX = max(centerX - visionRadius, 0), min(centerX + visionRadius, game.map.height - 1)
+    minY, maxY = max(centerY - visionRadius, 0), min(centerY + visionRadius, game.map.width - 1)
+    gameData = {'teammateNames': [], 'teammatePositions': [], 'enemyPositions': [],
+                'currentPosition': player.loc, 'coin1': [], 'coin2': [], 'coin3': [], 'walls': []}
+    for x in range(minX, maxX + 1):
+        for y in range(minY, maxY + 1):
+            cell = game.map.get((x, y))
+            if isinstance(cell, Player):
+                if cell.team is player.team and cell is not player:
+                    gameData['teammateNames'].append(cell.name)
+                    gameData['teammatePositions'].append((x, y))
+                elif cell.team is not player.team:
+                    gameData['enemyPositions'].append((x, y))
+            elif isinstance(cell, Coin1):
+                gameData['coin1'].append((x, y))
+            elif isinstance(cell, Coin2):
+                gameData['coin2'].append((x, y))
+            elif isinstance(cell, Coin3):
+                gameData['coin3'].append((x, y))
+            elif isinstance(cell, Wall):
+                gameData['walls'].append((x, y))
+    return gameData
+
+
+def bench_game_data():
+    """
+    Per-turn cost of building every player's game_state in a 4 player lobby on a 50x50 board
+    """
+    game = makeLobby()
+    players = list(game.all_players)
+    print('radius  legacy (us/turn)  window (us/turn)  speedup')
+    for radius in (2, 5, 10):
+        for name in players:
+            assert legacyGameData(game, name, radius) == game.getGameData(name, radius)
+        legacy = timePerCall(lambda: [legacyGameData(game, name, radius) for name in players])
+        window = timePerCall(lambda: [game.getGameData(name, radius) for name in players])
+        print(f'{radius:>6}  {legacy:>16.1f}  {window:>16.1f}  {legacy / window:>6.1f}x')
+
+
+class LegacyWall:
+    # gameItems.Wall before items were flyweights, one object per cell
+    code = WALL
+
+
+class LegacyCoin:
+    def __init__(self, value: int):
+        self.value = value
+
+
+class LegacyPlayer:
+    # player.Player before __slots__
+    def __init__(self, playerName: str, team):
+        self.__name = playerName
+        self.__team = team
+        self.__loc = None
+
+
+class LegacyTeam:
+    # team.Team before __slots__
+    def __init__(self, teamName: str):
+        self.__name = teamName
+        self.players = []
+        self.__score = 0
+
+
+def legacyFillMap(height: int, width: int, numPlayers: int, wallChoices: list[tuple[int, int]],
+                  wall=Wall, coins=(Coin1, Coin2, Coin3)) -> list[list]:
+    """
+    Rejection sampling reference of the old Map.__fillMap, on a bare grid
+    :param wall, coins: callables making the item put in each wall and coin cell
+    """
+    grid = [[None] * width for _ in range(height)]
+
+    def placeRandom(obj, choice=None):
+        while True:
+            if choice is None:
+                x, y = random.randint(0, height - 1), random.randint(0, width - 1)
+            else:
+                x, y = random.choice(choice)
+                choice.remove((x, y))
+            if grid[x][y] is None:
+                grid[x][y] = obj
+                return x, y
+
+    empty = width * height
+    choices = list(dict.fromkeys(wallChoices))
+    minWalls = int(Map.WALL_MIN_RATIO * empty)
+    minWalls = 0 if len(choices) < minWalls else minWalls
+    numWalls = random.randint(minWalls, len(choices))
+    for _ in range(numWalls):
+        placeRandom(wall(), choices)
+    for _ in range(numPlayers):
+        placeRandom(object())
+    empty = empty - numWalls - numPlayers
+    for _ in range(random.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))):
+        placeRandom(random.choices(coins, (6, 3, 1))[0]())
+    return grid
+
+
+def legacyIsBlocked(gameState: dict, pos: tuple[int, int]) -> bool:
+    blockObjects = gameState['walls'] + gameState['teammatePositions'] + gameState['enemyPositions']
+    playerPos = gameState['currentPosition']
+    gamePos = (playerPos[0] + pos[0], playerPos[1] + pos[1])
+    if gamePos[0] < 0 or gamePos[0] > 9 or gamePos[1] < 0 or gamePos[1] > 9:
+        return True
+    return any((obj[0] - playerPos[0], obj[1] - playerPos[1]) == pos for obj in blockObjects)
+
+
+def legacyCoinPath(gameState: dict, targetCoin) -> Optional[list]:
+    """
+    Reference of the old Challenge3.get_coin_path A*, which re-sorts its whole frontier every round
+    :return: the steps to targetCoin, None if it can't be reached
+    """
+    playerPos = gameState['currentPosition']
+    frontier = [((0, 0), None, 0, 0)]  # (relative pos, previous point, g, h)
+    closedPath = {(0, 0): 0}
+    while frontier:
+        workingFrontier = sorted(frontier[:], key=lambda point: point[2] + point[3])
+        frontier.clear()
+        for point in workingFrontier:
+            for c in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+                newPos = (point[0][0] + c[0], point[0][1] + c[1])
+                gamePos = (playerPos[0] + newPos[0], playerPos[1] + newPos[1])
+                newPoint = (newPos, point, point[2] + 1, abs(gamePos[0] - targetCoin[0]) + abs(gamePos[1] - targetCoin[1]))
+                if gamePos[0] == targetCoin[0] and gamePos[1] == targetCoin[1]:
+                    steps = []
+                    while newPoint[1] is not None:
+                        steps.append((newPoint[0][0] - newPoint[1][0][0], newPoint[0][1] - newPoint[1][0][1]))
+                        newPoint = newPoint[1]
+                    return steps[::-1]
+                elif -2 <= newPos[0] <= 2 and -2 <= newPos[1] <= 2 and not legacyIsBlocked(gameState, newPos) and (
+                        newPos not in closedPath or newPoint[2] + newPoint[3] < closedPath[newPos]):
+                    frontier.append(newPoint)
+                    closedPath[newPos] = newPoint[2] + newPoint[3]
+    return None
+
+
+def legacyPickCoin(gameState: dict):
+    """
+    Reference of the old Challenge3.pick_new_coin: A* to each coin, most valuable first, until one is reachable
+    """
+    for coin in gameState['coin3'] + gameState['coin2'] + gameState['coin1']:
+        steps = legacyCoinPath(gameState, coin)
+        if steps is not None:
+            return coin, steps
+    return None, None
+
+
+def bench_map_generation():
+    """
+    Map generation time from 10x10 to 1000x1000, with the default walls and with walls allowed on
+    a random 30% of the cells
+    """
+    print('board      walls    legacy (ms)  current (ms)')
+    for size in (10, 100, 500, 1000):
+        cells = [(x, y) for x in range(size) for y in range(size)]
+        for label, wallChoices in (('default', getDefaultWallChoices()),
+                                   ('dense', random.sample(cells, int(Map.WALL_MAX_RATIO * len(cells))))):
+            if label == 'dense' and size > 200:
+                continue  # the legacy list.remove is quadratic, too slow to time here
+            repeat, number = (3, 20) if size <= 100 else (1, 1)
+            random.seed(1)
+            legacy = timePerCall(lambda: legacyFillMap(size, size, 4, wallChoices), repeat, number)
+            rng = random.Random(1)
+            current = timePerCall(lambda: Map(size, size, [Player(f'P{i}', None) for i in range(4)], wallChoices, rng),
+                                  repeat, number)
+            print(f'{size:>4}x{size:<4}  {label:<7}  {legacy / 1000:>11.2f}  {current / 1000:>12.2f}')
+
+
+class LocalBroker:
+    """
+    In-process stand-in for the MQTT broker, delivers every publish to the matching subscribers
+    """
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, pattern: str, callback):
+        self.subscriptions.append((pattern.split('/'), callback))
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        levels = topic.split('/')
+        for pattern, callback in self.subscriptions:
+            if self.matches(pattern, levels):
+                callback(topic, payload)
+
+    @staticmethod
+    def matches(pattern: list[str], levels: list[str]) -> bool:
+        for i, level in enumerate(pattern):
+            if level == '#':
+                return True
+            if i >= len(levels) or (level != '+' and level != levels[i]):
+                return False
+        return len(pattern) == len(levels)
+
+
+def bench_sharded_server(lobbies: int = 64, seconds: float = 3.0):
+    """
+    Resolved turns per second of ShardedGameServer with random movers in every lobby, by worker count
+    """
+    from ShardedGameClient import ShardedGameServer
+    from GameClient import server_topics
+
+    print('workers  turns/s')
+    for workers in (1, 2, 4):
+        broker = LocalBroker()
+        server = ShardedGameServer(broker.publish, workers, quiet=True)
+        server.start()
+        for topic in server_topics:
+            broker.subscribe(topic, server.route)
+
+        turns = 0
+        moves = random.Random(1)
+
+        def on_scores(topic, payload):
+            nonlocal turns
+            turns += 1
+
+        def on_game_state(topic, payload):
+            # Every player answers its new state with a random move straight away
+            broker.publish(topic.rsplit('/', 1)[0] + '/move', moves.choice(('UP', 'DOWN', 'LEFT', 'RIGHT')))
+
+        broker.subscribe('games/+/scores', on_scores)
+        broker.subscribe('games/+/+/game_state', on_game_state)
+
+        for lobby in range(lobbies):
+            for player, team in (('A1', 'A'), ('A2', 'A'), ('B1', 'B'), ('B2', 'B')):
+                broker.publish('new_game', json.dumps({'lobby_name': f'lobby{lobby}', 'team_name': team,
+                                                       'player_name': f'{player}_{lobby}'}))
+        start = time.perf_counter()
+        for lobby in range(lobbies):
+            broker.publish(f'games/lobby{lobby}/start', 'START')
+        time.sleep(seconds)
+        rate = turns / (time.perf_counter() - start)
+        for lobby in range(lobbies):
+            broker.publish(f'games/lobby{lobby}/start', 'STOP')
+        server.stop()
+        print(f'{workers:>7}  {rate:>7.0f}')
+
+
+def bench_lobby_actors(lobbies: int = 2000, turns: int = 5):
+    """
+    Cost of creating and tearing down GameInstanceManager actors, and of hosting thousands of
+    lobbies on one LobbyPool through a single shared connection
+    """
+    from GameInstanceManger import GameInstanceManager, LobbyPool
+    from GameClient import server_topics
+
+    broker = LocalBroker()
+    pool = LobbyPool(broker)
+    for topic in server_topics:
+        broker.subscribe(topic, pool.route)
+
+    create = timePerCall(lambda: pool.close(GameInstanceManager('lobby', pool)), number=10000)
+    print(f'actor create + teardown: {create:.2f} us')
+
+    done = threading.Event()
+    resolved = 0
+    lock = threading.Lock()
+    moves = random.Random(1)
+
+    def on_scores(topic, payload):
+        nonlocal resolved
+        with lock:
+            resolved += 1
+            if resolved == lobbies * turns:
+                done.set()
+
+    def on_game_state(topic, payload):
+        lobby_turns[topic.split('/')[1]] += 1
+        # Stop feeding a lobby after its last turn, each turn publishes 4 states
+        if lobby_turns[topic.split('/')[1]] <= 4 * turns:
+            broker.publish(topic.rsplit('/', 1)[0] + '/move', moves.choice(('UP', 'DOWN', 'LEFT', 'RIGHT')))
+
+    lobby_turns = {f'lobby{lobby}': 0 for lobby in range(lobbies)}
+    broker.subscribe('games/+/scores', on_scores)
+    broker.subscribe('games/+/+/game_state', on_game_state)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for lobby in range(lobbies):
+            for player, team in (('A1', 'A'), ('A2', 'A'), ('B1', 'B'), ('B2', 'B')):
+                broker.publish('new_game', json.dumps({'lobby_name': f'lobby{lobby}', 'team_name': team,
+                                                       'player_name': f'{player}_{lobby}'}))
+        start = time.perf_counter()
+        for lobby in range(lobbies):
+            broker.publish(f'games/lobby{lobby}/start', 'START')
+        done.wait(60)
+        elapsed = time.perf_counter() - start
+        for lobby in range(lobbies):
+            broker.publish(f'games/lobby{lobby}/start', 'STOP')
+        pool.shutdown()
+    print(f'{lobbies} lobbies x {turns} turns: {resolved / elapsed:.0f} turns/s, {len(pool.lobbies)} lobbies left open')
+
+
+class CallbackServer:
+    """
+    GameClient as it runs under paho: one thread dispatching messages and publishing inline
+    """
+
+    def __init__(self, publish):
+        from GameClient import init_lobby_state
+        init_lobby_state(self)
+        self.publish_one = publish
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.publish_one(topic, payload)
+
+    def submit(self, topic, payload):
+        self.queue.put((topic, payload))
+
+    def run(self):
+        from GameClient import handle_message
+        while (message := self.queue.get()) is not None:
+            handle_message(self, message[0].split('/'), message[1])
+
+
+def bench_async_server(lobbies: int = 300, seconds: float = 3.0):
+    """
+    game_state delivery latency of the callback server and AsyncGameServer with random movers.
+    Latency runs from a lobby's last move of a turn to the delivery of its scores. Each server
+    publish pays a modelled network write that releases the GIL, as a socket send does.
+    """
+    import asyncio
+    from AsyncGameClient import AsyncGameServer
+
+    def measure(write_us, make_server):
+        broker = LocalBroker()
+        latencies, pending, last_move = [], {}, {}
+        moves = random.Random(1)
+
+        def publish(topic, payload=None):
+            if write_us:
+                time.sleep(write_us / 1e6)
+            broker.publish(topic, payload)
+
+        submit, run = make_server(publish)
+
+        def on_game_state(topic, payload):
+            lobby = topic.split('/')[1]
+            pending[lobby] = pending.get(lobby, 0) + 1
+            if pending[lobby] == 4:
+                pending[lobby] = 0
+                last_move[lobby] = time.perf_counter()
+            submit(topic.rsplit('/', 1)[0] + '/move', moves.choice((b'UP', b'DOWN', b'LEFT', b'RIGHT')))
+
+        def on_scores(topic, payload):
+            lobby = topic.split('/')[1]
+            if lobby in last_move:
+                latencies.append(time.perf_counter() - last_move.pop(lobby))
+
+        broker.subscribe('games/+/+/game_state', on_game_state)
+        broker.subscribe('games/+/scores', on_scores)
+        for lobby in range(lobbies):
+            for player, team in (('A1', 'A'), ('A2', 'A'), ('B1', 'B'), ('B2', 'B')):
+                submit('new_game', json.dumps({'lobby_name': f'lobby{lobby}', 'team_name': team,
+                                               'player_name': f'{player}_{lobby}'}).encode())
+            submit(f'games/lobby{lobby}/start', b'START')
+        run(seconds)
+        latencies.sort()
+        return latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3, len(latencies) / seconds
+
+    def callbackServer(publish):
+        server = CallbackServer(publish)
+
+        def run(seconds):
+            server.thread.start()
+            time.sleep(seconds)
+            server.queue.put(None)
+            server.thread.join()
+        return server.submit, run
+
+    def asyncServer(publish):
+        server = AsyncGameServer(lambda batch: [publish(topic, payload) for topic, payload in batch])
+        early = []
+
+        def submit(topic, payload):
+            if server.loop is None:
+                early.append((topic, payload))
+            else:
+                server.submit(topic, payload)
+
+        def run(seconds):
+            async def main():
+                server.loop = asyncio.get_running_loop()
+                for message in early:
+                    server.queue.put_nowait(message)
+                server.loop.call_later(seconds, server.stop)
+                await server.serve()
+            asyncio.run(main())
+            server.shutdown()
+        return submit, run
+
+    print('write (us)  server    p50 (ms)  p99 (ms)  turns/s')
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = [(write_us, label, *measure(write_us, make))
+                for write_us in (0, 50) for label, make in (('callback', callbackServer), ('async', asyncServer))]
+    for write_us, label, p50, p99, rate in rows:
+        print(f'{write_us:>10}  {label:<8}  {p50:>8.2f}  {p99:>8.2f}  {rate:>7.0f}')
+
+
+def bench_wire_format():
+    """
+    Bytes per game_state message and encode/decode time of the JSON and binary encodings
+    """
+    from wireFormat import encode_game_state, decode_game_state
+
+    game = makeLobby()
+    print('radius  encoding  bytes/msg  encode (us)  decode (us)')
+    for radius in (2, 5, 10):
+        states = [game.getGameData(name, radius) for name in game.all_players]
+        for encoding in ('json', 'binary'):
+            payloads = [encode_game_state(state, encoding) for state in states]
+            size = sum(map(len, payloads)) / len(payloads)
+            encode = timePerCall(lambda: [encode_game_state(state, encoding) for state in states]) / len(states)
+            decode = timePerCall(lambda: [decode_game_state(payload) for payload in payloads]) / len(states)
+            print(f'{radius:>6}  {encoding:<8}  {size:>9.0f}  {encode:>11.1f}  {decode:>11.1f}')
+
+
+def bench_pathfinding(turns: int = 100):
+    """
+    Bot path searches on 10x10 game states seen while playing random moves: A* to one coin and
+    picking the coin to chase, legacy Challenge3 searches against the pathfinding module
+    """
+    import pathfinding
+    from moveset import Moveset
+
+    game = Game({'TeamA': ['A1', 'A2'], 'TeamB': ['B1', 'B2']}, seed=1)
+    rng = random.Random(1)
+    states = []
+    for _ in range(turns):
+        if game.gameOver():
+            break
+        states.extend(state for state in (game.getGameData(name) for name in game.all_players)
+                      if state['coin1'] or state['coin2'] or state['coin3'])
+        game.resolveTurn({name: rng.choice(list(Moveset)) for name in game.all_players})
+
+    targets = [(state, (state['coin3'] + state['coin2'] + state['coin1'])[0]) for state in states]
+    for state, target in targets:
+        legacy, current = legacyCoinPath(state, target), pathfinding.find_path(state, target)
+        assert (legacy is None) == (current is None) and (current is None or len(current) <= len(legacy))
+
+    def timeEach(fn, items):
+        return timePerCall(lambda: [fn(*item) for item in items], number=20) / len(items)
+
+    print(f'{len(states)} game states with coins in view')
+    print('search         legacy (us)  current (us)')
+    legacy = timeEach(legacyCoinPath, targets)
+    current = timeEach(lambda state, target: pathfinding.find_path(state, target, pathfinding.blocked_cells(state)), targets)
+    print(f'path to coin  {legacy:>12.1f}  {current:>12.1f}')
+    legacy = timeEach(legacyPickCoin, [(state,) for state in states])
+    current = timeEach(pathfinding.best_coin, [(state,) for state in states])
+    print(f'pick coin     {legacy:>12.1f}  {current:>12.1f}')
+
+
+def bench_bot_policies(numGames: int = 200):
+    """
+    Headless games of the per-player Challenge3 bot against the team coordinator's planner, without
+    and with a TeamMemory, each policy playing both teams
+    """
+    import simulator
+
+    print('policy      turns/game  points/turn  us/team turn')
+    for name in ('astar', 'team', 'memory', 'static_map'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = simulator.runBatch(simulator.POLICIES[name], numGames)
+        turns = report['turnsPerGame']['mean'] * numGames
+        points = sum(score['mean'] for score in report['scores'].values()) * numGames
+        planUs = report['seconds'] / turns / len(simulator.DEFAULT_TEAMS) * 1e6
+        print(f"{name:<10}  {report['turnsPerGame']['mean']:>10.1f}  {points / turns:>11.3f}  {planUs:>12.0f}")
+
+
+def bench_state_inbox(messages: int = 2000):
+    """
+    Time from a game_state arriving on the network thread to the waiting bot thread holding it,
+    the old Challenge3 loop polled every 200 ms
+    """
+    from botClient import StateInbox
+
+    inbox = StateInbox()
+    state = makeLobby().getGameData('A1')
+    sent, latencies = [], []
+
+    def bot():
+        while inbox.next_state('A1') is not None:
+            latencies.append(time.perf_counter() - sent[-1])
+
+    thread = threading.Thread(target=bot)
+    thread.start()
+    for _ in range(messages):
+        sent.append(time.perf_counter())
+        inbox.put('A1', dict(state))
+        time.sleep(0.0005)
+    inbox.close()
+    thread.join()
+
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f'{len(latencies)} states  wake p50 {p50:.0f} us  p99 {p99:.0f} us  (200 ms polling: ~100000 us mean)')
+
+
+def bench_replay(numGames: int = 200, maxTurns: int = 300):
+    """
+    Replay logs of random-move games, ended after maxTurns: cost of recording a turn, log size, and re-simulation speed
+    """
+    import replay
+
+    class KeptBuffer(io.BytesIO):
+        def close(self):
+            pass  # keep the log readable after ReplayWriter.end
+
+    teams = {'TeamA': ['A1', 'A2'], 'TeamB': ['B1', 'B2']}
+    rng = random.Random(0)
+    logs, writeSeconds, turns = [], 0.0, 0
+    for seed in range(numGames):
+        game = Game(teams, seed=seed)
+        buffer = KeptBuffer()
+        writer = replay.ReplayWriter(buffer, seed, teams)
+        for _ in range(maxTurns):
+            if game.gameOver():
+                break
+            moves = {name: rng.choice(replay.MOVES) for name in game.all_players}
+            start = time.perf_counter()
+            writer.turn(moves)
+            writeSeconds += time.perf_counter() - start
+            game.resolveTurn(moves)
+            turns += 1
+        writer.end(game.getScores())
+        logs.append(buffer.getvalue())
+
+    start = time.perf_counter()
+    for data in logs:
+        log = replay.read_replay(data)
+        assert replay.replay_game(log).getScores() == log['scores']
+    replaySeconds = time.perf_counter() - start
+    print(f'{numGames} games, {turns} turns: record {writeSeconds / turns * 1e6:.2f} us/turn, '
+          f'{sum(map(len, logs)) / turns:.1f} bytes/turn, replay {turns / replaySeconds:.0f} turns/s, all scores match')
+
+
+def seededLayout(seed: int, size: int = 100) -> bytes:
+    return makeLobby(size, size, seed).map.map.codes.tobytes()
+
+
+def bench_seeded_maps(numMaps: int = 200, workers: int = 4):
+    """
+    Generating seeded 100x100 maps serially, on threads and on processes: every Game owns its random
+    number generator, so the layouts match whatever runs them
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    seeds = range(numMaps)
+    start = time.perf_counter()
+    serial = [seededLayout(seed) for seed in seeds]
+    print(f'serial            {(time.perf_counter() - start) / numMaps * 1e3:.2f} ms/map')
+    for label, executor in (('threads', ThreadPoolExecutor), ('processes', ProcessPoolExecutor)):
+        with executor(workers) as pool:
+            start = time.perf_counter()
+            layouts = list(pool.map(seededLayout, seeds))
+            elapsed = time.perf_counter() - start
+        assert layouts == serial
+        print(f'{workers} {label:<14} {elapsed / numMaps * 1e3:.2f} ms/map, same layouts as serial')
+
+
+def bench_map_pool(lobbies: int = 200):
+    """
+    start_game latency over a burst of START messages with every layout generated inline (an empty
+    pool) and drawn from a filled MapPool, then the part of a big board's Game that stays at start
+    """
+    from GameClient import init_lobby_state, start_game, remove_lobby
+    from mapPool import MapPool
+
+    class Server:
+        def publish(self, topic, payload=None, qos=0, retain=False):
+            pass
+
+    def burst(pool):
+        server = Server()
+        init_lobby_state(server, map_pool=pool)
+        for lobby in range(lobbies):
+            server.team_dict[f'lobby{lobby}'] = {'A': [f'A1_{lobby}', f'A2_{lobby}'],
+                                                 'B': [f'B1_{lobby}', f'B2_{lobby}'], 'started': False}
+        latencies = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for lobby in range(lobbies):
+                start = time.perf_counter()
+                start_game(server, ['games', f'lobby{lobby}', 'start'], b'START')
+                latencies.append(time.perf_counter() - start)
+                remove_lobby(server, f'lobby{lobby}')
+        latencies.sort()
+        return latencies
+
+    for label, pool in (('inline', MapPool(size=0)), ('pooled', MapPool(size=lobbies))):
+        while pool.stats()['ready']['10x10'] < pool.size:
+            time.sleep(0.01)
+        latencies = burst(pool)
+        stats = pool.stats()
+        pool.close()
+        print(f"{label:<7} {lobbies} starts: mean {statistics.mean(latencies) * 1e6:.0f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us, {stats['hits']} hits {stats['misses']} misses")
+
+    teams = {'A': ['A1', 'A2'], 'B': ['B1', 'B2']}
+    for size in (10, 100, 500):
+        inline = timePerCall(lambda: Game(teams, size, size, seed=1), number=5)
+        pool = MapPool(size=0)
+        layouts = [pool.take(size, size) for _ in range(5 * 5)]
+        pool.close()
+        placed = timePerCall(lambda: Game(teams, layout=layouts.pop()), number=5)
+        print(f'{size}x{size}: Game from a seed {inline:.0f} us, from a pooled layout {placed:.0f} us')
+
+
+def allocatedBytes(fn) -> int:
+    """
+    Bytes still allocated by what fn() returns, traced with tracemalloc
+    """
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = fn()
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory():
+    """
+    Memory of a board's items with an object per wall and coin and with the flyweight items, of a
+    whole Map, and of a lobby's players and teams with and without __slots__
+    """
+    legacyCoins = (lambda: LegacyCoin(1), lambda: LegacyCoin(2), lambda: LegacyCoin(3))
+    print('board      per-cell items  flyweight items  Map')
+    for size in (10, 500):
+        random.seed(1)
+        legacy = allocatedBytes(lambda: legacyFillMap(size, size, 4, getDefaultWallChoices(), LegacyWall, legacyCoins))
+        random.seed(1)
+        flyweight = allocatedBytes(lambda: legacyFillMap(size, size, 4, getDefaultWallChoices()))
+        current = allocatedBytes(lambda: Map(size, size, [Player(f'P{i}', None) for i in range(4)], rng=random.Random(1)))
+        print(f'{size:>4}x{size:<4} {legacy:>14,} {flyweight:>16,} {current:>12,}')
+
+    def lobby(teamClass, playerClass, numTeams: int = 2, perTeam: int = 2):
+        teams = [teamClass(f'team{t}') for t in range(numTeams)]
+        return teams, [playerClass(f'player{t}_{p}', team) for t, team in enumerate(teams) for p in range(perTeam)]
+
+    from team import Team
+    legacy = allocatedBytes(lambda: [lobby(LegacyTeam, LegacyPlayer) for _ in range(1000)]) / 1000
+    slotted = allocatedBytes(lambda: [lobby(Team, Player) for _ in range(1000)]) / 1000
+    print(f'players and teams of a 2x2 lobby: {legacy:.0f} bytes with __dict__, {slotted:.0f} bytes with __slots__')
+    for size in (10, 500):
+        teams = {'A': ['A1', 'A2'], 'B': ['B1', 'B2']}
+        print(f'{size}x{size} lobby: {allocatedBytes(lambda: Game(teams, size, size, seed=1)):,} bytes per Game')
+
+
+def legacyResolveTurn(game: Game, moves: dict) -> None:
+    """
+    Game.resolveTurn as it was before the unchecked core: getPlayer and the Moveset assert per move,
+    the asserting Map.get for occupants, Team.increaseScore and the Player.loc setter per mover
+    """
+    from moveset import Moveset
+
+    targets = {}
+    for playerName in sorted(moves):
+        move = moves[playerName]
+        assert isinstance(move, Moveset)
+        player = game.getPlayer(playerName)
+        x, y = player.loc
+        dx, dy = move.value
+        new_loc = x+dx, y+dy
+        if not (0 <= new_loc[0] < game.map.height) or not (0 <= new_loc[1] < game.map.width):
+            continue
+        if game.map.getCode(new_loc) != WALL and new_loc not in targets:
+            targets[new_loc] = player
+    wanted = {player: loc for loc, player in targets.items()}
+
+    moved = {}
+    order = []
+    for player in wanted:
+        chain = []
+        occupant = player
+        while occupant in wanted and occupant not in moved:
+            moved[occupant] = None
+            chain.append(occupant)
+            loc = wanted[occupant]
+            occupant = game.map.get(loc) if game.map.getCode(loc) == PLAYER else None
+        moving = occupant is None or bool(moved.get(occupant))
+        for mover in chain:
+            moved[mover] = moving
+        if moving:
+            order.extend(reversed(chain))
+
+    for player in order:
+        code = game.map.getCode(wanted[player])
+        if code != EMPTY:
+            player.team.increaseScore(COIN_VALUES[code])
+        game.map.movePlayer(player, wanted[player])
+        player.loc = wanted[player]
+
+
+def bench_move_checks(numGames: int = 200, turns: int = 100):
+    """
+    Cost per move of the same turns played through the old asserting resolveTurn, the checked
+    public API and the unchecked path GameClient uses once player_move has validated the input.
+    Run without -O, the checks are asserts.
+    """
+    from moveset import Moveset
+
+    rng = random.Random(0)
+    turnMoves = [[{name: rng.choice(list(Moveset)) for name in ('A1', 'A2', 'B1', 'B2')} for _ in range(numGames)]
+                 for _ in range(turns)]
+    numMoves = numGames * turns * 4
+
+    def play(label, apply, repeat=3):
+        # Best of a few fresh runs, one run is too noisy to tell the paths apart
+        times = []
+        for _ in range(repeat):
+            games = [makeLobby(20, 20, seed) for seed in range(numGames)]
+            start = time.perf_counter()
+            for moves in turnMoves:
+                for game, gameMoves in zip(games, moves):
+                    apply(game, gameMoves)
+            times.append(time.perf_counter() - start)
+        elapsed = min(times)
+        print(f'{label:<28} {elapsed / numMoves * 1e6:.2f} us/move')
+        return elapsed, [game.getScores() for game in games]
+
+    legacy, legacyScores = play('old resolveTurn', legacyResolveTurn)
+    checked, checkedScores = play('resolveTurn', lambda game, moves: game.resolveTurn(moves))
+    unchecked, uncheckedScores = play('resolveTurn(checked=False)', lambda game, moves: game.resolveTurn(moves, checked=False))
+    assert legacyScores == checkedScores == uncheckedScores
+    print(f'checked path {legacy / checked:.2f}x, unchecked path {legacy / unchecked:.2f}x the speed of the old one, same scores')
+
+
+def bench_batched_game(numGames: int = 500, turns: int = 50):
+    # Steps the same games and moves one Game.resolveTurn call at a time and as one BatchedGame
+    from batchedGame import BatchedGame
+    from moveset import Moveset
+
+    def makeGames():
+        return [makeLobby(20, 20, seed) for seed in range(numGames)]
+
+    rng = random.Random(0)
+    numPlayers = 4
+    turnMoves = [[rng.choice(list(Moveset)) for _ in range(numGames * numPlayers)] for _ in range(turns)]
+
+    games = makeGames()
+    start = time.perf_counter()
+    for moves in turnMoves:
+        for g, game in enumerate(games):
+            if game.gameOver():
+                continue
+            game.resolveTurn({name: moves[g * numPlayers + p] for p, name in enumerate(game.all_players)},
+                             checked=False)
+    sequential = time.perf_counter() - start
+
+    batch = BatchedGame.fromGames(makeGames())
+    start = time.perf_counter()
+    for moves in turnMoves:
+        batch.step(moves)
+    batched = time.perf_counter() - start
+
+    assert all(batch.getScores(g) == game.getScores() for g, game in enumerate(games))
+    assert all(batch.playerLoc(g, name) == player.loc for g, game in enumerate(games)
+               for name, player in game.all_players.items())
+    playerTurns = numGames * numPlayers * turns
+    print(f"{numGames} games x {turns} turns: Game.resolveTurn {playerTurns / sequential / 1e3:.0f}k moves/s, "
+          f"BatchedGame.step {playerTurns / batched / 1e3:.0f}k moves/s ({sequential / batched:.1f}x)")
+
+
+def bench_board_scaling(sizes=(10, 100, 500, 1000, 2000), turns: int = 2000):
+    """
+    Cost of map generation, turn resolution and state publishing as the board grows. Turns and
+    game_states only touch the players' cells and views, so they should stay flat; generation and
+    the one-off map_info grow with the number of cells.
+    """
+    from GameClient import init_lobby_state, publish_game_state
+    from InputTypes import LobbyConfig
+    from mapPool import MapPool
+    from moveset import Moveset
+    from wireFormat import encode_map_info
+
+    class Server:
+        def __init__(self):
+            self.sent = 0
+
+        def publish(self, topic, payload=None, qos=0, retain=False):
+            self.sent += len(payload)
+
+    teams = {'A': ['A1', 'A2'], 'B': ['B1', 'B2']}
+    rng = random.Random(0)
+    turnMoves = [{name: rng.choice(list(Moveset)) for name in ('A1', 'A2', 'B1', 'B2')} for _ in range(turns)]
+    print('board        layout (ms)  game (ms)  turn (us)  json state (us)  binary state (us)  map_info (ms, kB)')
+    for size in sizes:
+        number = 20 if size <= 100 else 1
+        layout = timePerCall(lambda: Map.generateLayout(size, size, random.Random(1), seed=1), 3, number) / 1000
+        game = timePerCall(lambda: Game(teams, size, size, seed=1), 3, number) / 1000
+
+        played = Game(teams, size, size, seed=1)
+        start = time.perf_counter()
+        for moves in turnMoves:
+            played.resolveTurn(moves, checked=False)
+        turn = (time.perf_counter() - start) / turns * 1e6
+
+        states = {}
+        for encoding in ('json', 'binary'):
+            server = Server()
+            pool = MapPool(size=0)
+            init_lobby_state(server, map_pool=pool)
+            server.game_dict['lobby'] = played
+            server.config_dict['lobby'] = LobbyConfig(height=size, width=size, encoding=encoding)
+            states[encoding] = timePerCall(lambda: publish_game_state(server, 'lobby', 'A1'), 3, 500)
+            pool.close()
+
+        # What a JSON lobby is sent, boards over MAX_JSON_MAP_INFO_CELLS get the compact encoding
+        start = time.perf_counter()
+        mapInfo = encode_map_info(size, size, played.map.wallMask(), 'json')
+        mapInfoTime = (time.perf_counter() - start) * 1000
+        print(f"{size:>5}x{size:<5}  {layout:>11.2f}  {game:>9.2f}  {turn:>9.2f}  {states['json']:>15.1f}  "
+              f"{states['binary']:>17.1f}  {mapInfoTime:>8.1f}, {len(mapInfo) / 1024:.0f}")
+
+
+benchmarks = {
+    'game_data': bench_game_data,
+    'map_generation': bench_map_generation,
+    'sharded_server': bench_sharded_server,
+    'lobby_actors': bench_lobby_actors,
+    'async_server': bench_async_server,
+    'wire_format': bench_wire_format,
+    'batched_game': bench_batched_game,
+    'pathfinding': bench_pathfinding,
+    'bot_policies': bench_bot_policies,
+    'state_inbox': bench_state_inbox,
+    'replay': bench_replay,
+    'seeded_maps': bench_seeded_maps,
+    'map_pool': bench_map_pool,
+    'memory': bench_memory,
+    'move_checks': bench_move_checks,
+    'board_scaling': bench_board_scaling,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks.keys():
+        print(f'== {name}')
+        benchmarks[name]()
@@ -0,0 +1,130 @@
+"""
+Client side of a lobby for bots: joins players, rebuilds their game_states from the server's
+messages and hands each new state to the bot as soon as it arrives.
+
+States can be pulled with StateInbox.next_state, which blocks until the player's next state, or
+pushed to listeners called on the network thread.
+"""
+
+import json
+import threading
+from typing import Optional
+
+from stateDelta import apply_game_state
+from wireFormat import decode_game_state, decode_map_info, decode_scores
+
+
+class StateInbox:
+    """
+    Latest game_state of every player, safe to fill from the network thread while bots wait on it
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.states = {}
+        self.received = {}  # states received per player
+        self.taken = {}  # states handed out by next_state per player
+        self.closed = False
+
+    def put(self, player, message: dict) -> Optional[dict]:
+        """
+        :param message: decoded game_state message, snapshot, keyframe or delta
+        :return: the player's new game state, None if a delta arrived without a base state
+        """
+        with self.condition:
+            state = apply_game_state(self.states.get(player), message)
+            if state is None:
+                return None  # wait for the next keyframe
+            self.states[player] = state
+            self.received[player] = self.received.get(player, 0) + 1
+            self.condition.notify_all()
+        return state
+
+    def next_state(self, player, timeout: float = None) -> Optional[dict]:
+        """
+        Waits for a state of player newer than the last one returned, states arriving in between are skipped
+        :return: the player's latest game state, None on timeout or once the inbox is closed
+        """
+        with self.condition:
+            fresh = lambda: self.received.get(player, 0) > self.taken.get(player, 0)
+            if not self.condition.wait_for(lambda: fresh() or self.closed, timeout) or not fresh():
+                return None
+            self.taken[player] = self.received[player]
+            return self.states[player]
+
+    def latest(self, player) -> Optional[dict]:
+        with self.condition:
+            return self.states.get(player)
+
+    def close(self):
+        # Wakes every waiting bot, e.g. when the game is over
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class BotClient:
+    """
+    Plays players of one lobby through a paho client, set on_message as the client's callback
+    """
+
+    def __init__(self, client, lobby_name: str):
+        """
+        :param client: the paho client, or any object with publish(topic, payload) and subscribe(topic)
+        """
+        self.client = client
+        self.lobby_name = lobby_name
+        self.inbox = StateInbox()
+        self.listeners = []  # callables(player_name, game_state) run on the network thread
+        self.map_listeners = []  # callables(map_info) run on the network thread
+        self.board_listeners = []  # callables(board) run on the network thread
+        self.board = None
+        self.map_info = None
+        self.scores = {}
+        self.game_over = threading.Event()
+
+    def subscribe(self):
+        for topic in ('lobby', '+/game_state', 'scores', 'board', 'map_info'):
+            self.client.subscribe(f'games/{self.lobby_name}/{topic}')
+
+    def configure(self, **options):
+        # Lobby options, see InputTypes.LobbyConfig
+        self.client.publish(f'games/{self.lobby_name}/config', json.dumps(options))
+
+    def join(self, player_name: str, team_name: str):
+        self.client.publish('new_game', json.dumps({'lobby_name': self.lobby_name,
+                                                    'team_name': team_name,
+                                                    'player_name': player_name}))
+
+    def start(self):
+        self.client.publish(f'games/{self.lobby_name}/start', 'START')
+
+    def move(self, player_name: str, command: str):
+        self.client.publish(f'games/{self.lobby_name}/{player_name}/move', command)
+
+    def on_message(self, client, userdata, msg):
+        topic_list = msg.topic.split('/')
+        if topic_list[-1] == 'game_state':
+            player_name = topic_list[2]
+            state = self.inbox.put(player_name, decode_game_state(msg.payload))
+            if state is not None:
+                for listener in self.listeners:
+                    listener(player_name, state)
+        elif topic_list[-1] == 'board':
+            # Board size and vision radius, published once before map_info and the first game_state
+            self.board = json.loads(msg.payload)
+            for listener in self.board_listeners:
+                listener(self.board)
+        elif topic_list[-1] == 'map_info':
+            # Published once before the first game_state when the lobby has map_info turned on
+            self.map_info = decode_map_info(msg.payload)
+            for listener in self.map_listeners:
+                listener(self.map_info)
+        elif topic_list[-1] == 'scores':
+            self.scores = decode_scores(msg.payload)
+        elif topic_list[-1] == 'lobby':
+            text = msg.payload.decode()
+            print(f'SERVER MSG {text}')
+            if text.startswith('Game Over'):
+                self.game_over.set()
+                self.inbox.close()
@@ -0,0 +1,239 @@
+"""
+Plans a whole team's moves at once from all of its players' game_states.
+
+The team's views are merged into one picture of the board, every player gets a distance field over
+it, and coins are matched to players so the team's total cost is lowest: no two teammates chase the
+same coin. With a TeamMemory the plan covers everything the team has seen so far, and players
+left without a coin explore the frontier. Any player still without a target falls back to a
+wanderer's random walk.
+"""
+
+import threading
+
+import pathfinding
+from teamMemory import TeamMemory
+
+UNREACHABLE = 10 ** 6
+
+COMMANDS = {(-1, 0): 'UP', (1, 0): 'DOWN', (0, -1): 'LEFT', (0, 1): 'RIGHT'}
+
+
+def coin_cost(distance: int, value: int) -> int:
+    # A more valuable coin is worth a detour of one step per point
+    return distance - value
+
+
+def min_cost_assignment(costs: list[list[int]]) -> list[int]:
+    """
+    Hungarian algorithm, O(n^2 m)
+    :param costs: n x m cost matrix with n <= m
+    :return: the column assigned to each row, every column used at most once
+    """
+    n, m = len(costs), len(costs[0]) if costs else 0
+    assert n <= m
+    inf = float('inf')
+    # 1-indexed potentials, column 0 is the virtual start column
+    u, v = [0] * (n + 1), [0] * (m + 1)
+    owner, way = [0] * (m + 1), [0] * (m + 1)
+    for row in range(1, n + 1):
+        owner[0] = row
+        col0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while owner[col0] != 0:
+            used[col0] = True
+            row0, delta, col1 = owner[col0], inf, 0
+            for col in range(1, m + 1):
+                if not used[col]:
+                    cur = costs[row0 - 1][col - 1] - u[row0] - v[col]
+                    if cur < minv[col]:
+                        minv[col], way[col] = cur, col0
+                    if minv[col] < delta:
+                        delta, col1 = minv[col], col
+            for col in range(m + 1):
+                if used[col]:
+                    u[owner[col]] += delta
+                    v[col] -= delta
+                else:
+                    minv[col] -= delta
+            col0 = col1
+        while col0:
+            col1 = way[col0]
+            owner[col0] = owner[col1]
+            col0 = col1
+
+    assignment = [0] * n
+    for col in range(1, m + 1):
+        if owner[col]:
+            assignment[owner[col] - 1] = col - 1
+    return assignment
+
+
+class TeamPlanner:
+    """
+    Turns a team's game_states into one move per player
+    """
+
+    def __init__(self, wanderer, memory: TeamMemory = None, distances: pathfinding.DistanceFields = None, **area):
+        """
+        :param wanderer: object with wander(player, game_state, blocked) -> command, e.g. a Challenge3.CoinChaser
+        :param memory: the team's TeamMemory, plans from this turn's views only when not given
+        :param distances: distance fields over the lobby's static walls, see use_distances
+        :param area: radius, height and width passed on to pathfinding.search_bounds
+        """
+        self.wanderer = wanderer
+        self.memory = memory
+        self.distances = None
+        self.area = area
+        if distances is not None:
+            self.use_distances(distances)
+
+    def use_board(self, board: dict):
+        """
+        Searches and remembers the board size and vision radius from the lobby's board message
+        """
+        self.area = pathfinding.board_area(board)
+        if self.memory is not None:
+            self.memory.height, self.memory.width, self.memory.radius = board['height'], board['width'], board['vision_radius']
+
+    def use_map_info(self, map_info: dict):
+        """
+        Plans with cached distances over the walls from the lobby's map_info instead of searching every turn.
+        Builds distance fields for this planner alone, planners of the same lobby should share theirs
+        through use_distances.
+        """
+        self.use_distances(pathfinding.DistanceFields.from_map_info(map_info))
+
+    def use_distances(self, distances: pathfinding.DistanceFields):
+        """
+        Plans with distance fields shared with the lobby's other planners
+        """
+        self.distances = distances
+        distances.planners += 1
+        if self.memory is not None:
+            self.memory.walls.update(distances.walls)
+
+    def nearest_targets(self, targets: dict, positions: dict) -> dict:
+        """
+        Keeps the targets closest to the team by Manhattan distance, as many as this planner's share
+        of the cached distance fields, so a turn doesn't compute fields only to evict them
+        :param targets: {cell: cost}
+        :param positions: {player_name: (x, y)}
+        """
+        limit = max(self.distances.max_fields // max(self.distances.planners, 1), len(positions), 1)
+        if len(targets) <= limit:
+            return targets
+        spread = lambda cell: min(abs(cell[0] - x) + abs(cell[1] - y) for x, y in positions.values())
+        return {cell: targets[cell] for cell in sorted(targets, key=lambda cell: (spread(cell), cell))[:limit]}
+
+    def plan(self, states: dict) -> dict:
+        """
+        :param states: {player_name: game_state} of players on the same team, all from the same turn
+        :return: {player_name: move command}
+        """
+        if self.memory is not None:
+            self.memory.update(states)
+            passable, coins, blocked = self.memory.passable(), self.memory.coins, self.memory.players
+        else:
+            # Merge the team's views: cells anyone can see, minus anything anyone sees blocking them
+            visible, blocked, coins = set(), set(), {}
+            for state in states.values():
+                visible |= pathfinding.view_cells(state, **self.area)
+                blocked |= pathfinding.blocked_cells(state)
+                for key, value in pathfinding.COIN_VALUES.items():
+                    coins.update((tuple(pos), value) for pos in state[key])
+            passable = visible - blocked
+
+        players = list(states)
+        positions = {player: tuple(states[player]['currentPosition']) for player in players}
+        coin_targets = {coin: coin_cost(0, value) for coin, value in coins.items()}
+        if self.distances is not None:
+            # Table lookups over the static walls, only the players in the way are checked each turn.
+            # Distances and steps both read the field of the target, which is kept while the coin is
+            distance = lambda player, cell: self.distances.distance(positions[player], cell)
+            step = lambda player, cell: self.distances.next_step(positions[player], cell, blocked)
+            moves = self.assign(players, self.nearest_targets(coin_targets, positions), distance, step)
+            idle = [player for player in players if player not in moves]
+            if idle and self.memory is not None:
+                idle_positions = {player: positions[player] for player in idle}
+                frontier = self.nearest_targets(dict.fromkeys(self.memory.frontier(), 0), idle_positions)
+                moves.update(self.assign(idle, frontier, distance, step))
+        else:
+            fields = {player: pathfinding.distance_field(positions[player], passable) for player in players}
+            moves = self.assign(players, coin_targets, *self.searches(fields))
+            idle = [player for player in players if player not in moves]
+            if idle and self.memory is not None:
+                # Send players without a coin to explore, each towards a different unseen cell
+                frontier = self.memory.frontier()
+                fields = {player: pathfinding.distance_field(positions[player], passable | frontier) for player in idle}
+                moves.update(self.assign(idle, dict.fromkeys(frontier, 0), *self.searches(fields)))
+
+        for player in players:
+            if player not in moves:
+                moves[player] = self.wanderer.wander(player, states[player])
+        return moves
+
+    @staticmethod
+    def searches(fields: dict):
+        """
+        :param fields: {player_name: pathfinding.distance_field from the player}
+        :return: the distance and step functions assign takes, over those fields
+        """
+        distance = lambda player, cell: fields[player][0].get(cell)
+        step = lambda player, cell: pathfinding.path_to(fields[player][1], cell)[0]
+        return distance, step
+
+    @staticmethod
+    def assign(players: list, targets: dict, distance, step) -> dict:
+        """
+        Matches players to distinct targets for the lowest total distance plus target cost
+        :param targets: {cell: cost of the target besides the distance to it}
+        :param distance: callable(player_name, cell) -> steps to cell, None if it can't be reached
+        :param step: callable(player_name, cell) -> first (dx, dy) step towards cell, None if it's blocked
+        :return: {player_name: first move command} of the players that got a reachable target
+        """
+        cells = sorted(targets)
+        costs = []
+        for player in players:
+            row = []
+            for cell in cells:
+                steps = distance(player, cell)
+                row.append(UNREACHABLE if steps is None or steps == 0 else steps + targets[cell])
+            # One dummy column per player, so players are left without a target rather than sent to an unreachable one
+            costs.append(row + [UNREACHABLE] * len(players))
+
+        moves = {}
+        for player, row, col in zip(players, costs, min_cost_assignment(costs)):
+            if row[col] < UNREACHABLE:
+                first = step(player, cells[col])
+                if first is not None:
+                    moves[player] = COMMANDS[first]
+        return moves
+
+
+class TeamCoordinator:
+    """
+    Collects a team's game_states as they arrive and publishes every player's move as soon as the
+    whole team has its state for the turn, call on_game_state from the client's on_message.
+    """
+
+    def __init__(self, players: list, planner: TeamPlanner, publish):
+        """
+        :param players: names of the team's players
+        :param publish: callable(player_name, command) sending a move to the server
+        """
+        self.players = list(players)
+        self.planner = planner
+        self.publish = publish
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def on_game_state(self, player, game_state):
+        with self.lock:
+            self.pending[player] = game_state
+            if len(self.pending) < len(self.players):
+                return
+            states, self.pending = self.pending, {}
+            moves = self.planner.plan(states)
+        for player, command in moves.items():
+            self.publish(player, command)
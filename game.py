@@ -2,7 +2,7 @@
 Author: Charles Lee
 """
 
-from map import Map
+from map import Map, MapLayout
 from moveset import Moveset
 from player import Player
 from team import Team
@@ -10,17 +10,24 @@ from gameItems import *
 import random
 
 class Game:
-    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10):
+    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10,
+                 seed: int | random.Random = None, layout: MapLayout = None):
         """
         :param playerNames: Dictionary for each team name with a list of player names
+        :param seed: seed or random.Random the map is generated with, games with the same seed get the same map
+        :param layout: pre-generated walls and coins (see map.MapLayout) the players are placed on instead,
+            width and height are taken from it
         """
         self.numTeams = len(playerNames)
 
         self.teams, self.all_players = self.__initializePlayers(playerNames)
 
+        if layout is not None:
+            height, width = layout.height, layout.width
         self.__height = height
         self.__width = width
-        self.map = Map(height, width, list(self.all_players.values()))
+        rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+        self.map = Map(height, width, list(self.all_players.values()), rng=rng, layout=layout)
 
     def __initializePlayers(self, playerNames: dict[str,list[str]]):
         teams = {}
@@ -34,8 +41,9 @@ class Game:
 
     def movePlayer(self, playerName: str, move: Moveset):
         assert isinstance(move, Moveset)
-        player = self.getPlayer(playerName)
+        self.__movePlayer(self.getPlayer(playerName), move)
 
+    def __movePlayer(self, player: Player, move: Moveset):
         x, y = player.loc
         dx, dy = move.value
         new_loc = x+dx, y+dy
@@ -43,17 +51,70 @@ class Game:
         if not (0 <= new_loc[0] < self.__height) or not (0 <= new_loc[1] < self.__width):
             return
 
-        cell = self.map.get(new_loc)
-        if isinstance(cell, Player) or isinstance(cell, Wall):
+        code = self.map.getCode(new_loc)
+        if code == PLAYER or code == WALL:
             return
 
-        if isinstance(cell, Coin):
-            player.team.increaseScore(cell.value)
-            self.map.decreaseCoin()
+        if code != EMPTY:
+            player.team._addScore(COIN_VALUES[code])
 
-        self.map.set(player.loc, None)
-        self.map.set(new_loc, player)
-        player.loc = new_loc
+        self.map.movePlayer(player, new_loc)
+
+    def resolveTurn(self, moves: dict[str, Moveset], checked: bool = True):
+        """
+        Applies every move of a turn at once, the outcome doesn't depend on the order of moves:
+        moves off the map or into a wall are dropped, when several players move into the same cell
+        the first by player name gets it (and its coin) and the others stay put, and a player may
+        follow into a cell its occupant leaves this turn, but swaps and cycles stay put
+        :param moves: {playerName: Moveset}, players without a move stay put
+        :param checked: validate every name and move first, pass False only for moves already
+            validated at the boundary (e.g. GameClient.player_move)
+        """
+        if checked:
+            for playerName, move in moves.items():
+                assert isinstance(move, Moveset)
+                self.getPlayer(playerName)
+        self.__resolveTurn(moves)
+
+    def __resolveTurn(self, moves: dict[str, Moveset]):
+        targets = {}  # cell -> player that gets to move there
+        players = self.all_players
+        height, width = self.__height, self.__width
+        getCode, playerAt = self.map.getCode, self.map.playerAt
+        for playerName in sorted(moves):
+            player = players[playerName]
+            x, y = player.loc
+            dx, dy = moves[playerName].value
+            new_loc = x+dx, y+dy
+            if not (0 <= new_loc[0] < height) or not (0 <= new_loc[1] < width):
+                continue
+            if getCode(new_loc) != WALL and new_loc not in targets:
+                targets[new_loc] = player
+        wanted = {player: loc for loc, player in targets.items()}
+
+        # Follow each chain of players moving into each other's cells, a chain moves only if it
+        # ends in a free cell, moved[player] is None while its chain is being followed
+        moved = {}
+        order = []  # movers, each after the player whose cell it takes
+        for player in wanted:
+            chain = []
+            occupant = player
+            while occupant in wanted and occupant not in moved:
+                moved[occupant] = None
+                chain.append(occupant)
+                occupant = playerAt(wanted[occupant])
+            moving = occupant is None or bool(moved.get(occupant))
+            for mover in chain:
+                moved[mover] = moving
+            if moving:
+                order.extend(reversed(chain))
+
+        for player in order:
+            loc = wanted[player]
+            code = getCode(loc)
+            if code != EMPTY:
+                player.team._addScore(COIN_VALUES[code])
+            self.map.movePlayer(player, loc)
 
     def getPlayer(self, playerName: str) -> Player:
         assert isinstance(playerName, str)
@@ -62,10 +123,11 @@ class Game:
         except KeyError:
             raise KeyError(f'{playerName} is not a valid player name')
 
-    def getGameData(self, playerName:str, visionRadius: int = 2) -> dict:
+    def getGameData(self, playerName:str, visionRadius: int = 2, checked: bool = True) -> dict:
         """
         :param playerName:
         :param vision:
+        :param checked: validate the arguments, pass False for names taken from all_players
         :return: {
             teammateNames: [],
             teammatePositions: [(x,y),...],
@@ -77,46 +139,49 @@ class Game:
             walls: [(x,y),...]
         }
         """
-        assert isinstance(playerName, str)
-        assert isinstance(visionRadius, int)
-        player = self.getPlayer(playerName)
+        if checked:
+            assert isinstance(playerName, str)
+            assert isinstance(visionRadius, int)
+            player = self.getPlayer(playerName)
+        else:
+            player = self.all_players[playerName]
         centerX, centerY = player.loc
         minX = max(centerX - visionRadius, 0)
         maxX = min(centerX + visionRadius, self.__height-1)
         minY = max(centerY - visionRadius, 0)
         maxY = min(centerY + visionRadius, self.__width-1)
-        gameData = {'teammateNames': [],
-                    'teammatePositions': [],
-                    'enemyPositions': [],
-                    'currentPosition': player.loc,
-                    'coin1': [],
-                    'coin2': [],
-                    'coin3': [],
-                    'walls': []}
-
-        for x in range(minX, maxX+1):
-            for y in range(minY, maxY+1):
-                cell = self.map.get((x,y))
-                self.__addGameData(gameData, cell, (x,y), player)
-
-        return gameData
-
-    def __addGameData(self, gameData: dict, cell: object, loc: tuple[int, int], player: Player):
-        if isinstance(cell, Player):
+        teammateNames, teammatePositions, enemyPositions = [], [], []
+        found = self.map.window(minX, maxX, minY, maxY)
+        for loc in found[PLAYER]:
+            cell = self.map.playerAt(loc)
             if cell.team is player.team and cell is not player:
-                gameData['teammateNames'].append(cell.name)
-                gameData['teammatePositions'].append(loc)
+                teammateNames.append(cell.name)
+                teammatePositions.append(loc)
             elif cell.team is not player.team:
-                gameData['enemyPositions'].append(loc)
-        elif isinstance(cell, Coin1):
-            gameData['coin1'].append(loc)
-        elif isinstance(cell, Coin2):
-            gameData['coin2'].append(loc)
-        elif isinstance(cell, Coin3):
-            gameData['coin3'].append(loc)
-        elif isinstance(cell, Wall):
-            gameData['walls'].append(loc)
-    
+                enemyPositions.append(loc)
+
+        return {'teammateNames': teammateNames,
+                'teammatePositions': teammatePositions,
+                'enemyPositions': enemyPositions,
+                'currentPosition': player.loc,
+                'coin1': found[COIN1],
+                'coin2': found[COIN2],
+                'coin3': found[COIN3],
+                'walls': found[WALL]}
+
+    def getMapInfo(self) -> dict:
+        """
+        The parts of the map that never change during a game
+        :return: {
+            height: int,
+            width: int,
+            walls: [(x,y),...]
+        }
+        """
+        return {'height': self.__height,
+                'width': self.__width,
+                'walls': sorted(self.map.walls)}
+
     def gameOver(self):
         return self.map.numCoins <= 0
 
@@ -128,8 +193,7 @@ class Game:
 
 
 if __name__ == '__main__':
-    random.seed(1)
-    g = Game({'TeamA': ['Charles', 'Girish'], 'TeamB': ['James']})
+    g = Game({'TeamA': ['Charles', 'Girish'], 'TeamB': ['James']}, seed=1)
     print(g.map)
     print(g.getScores())
     multiMove = lambda name, moves: [g.movePlayer(name, move) for move in moves]
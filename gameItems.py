@@ -2,27 +2,53 @@
 Author: Charles Lee
 """
 
-from abc import abstractmethod
+# Cell codes stored in Map's compact grid, one byte per cell
+EMPTY = 0
+WALL = 1
+COIN1 = 2
+COIN2 = 3
+COIN3 = 4
+PLAYER = 5
 
-class Wall:
-    pass
+class CellItem:
+    """
+    Cell items are flyweights, every Wall() is the same object and so is every Coin1() etc.
+    """
+    __slots__ = ()
+    code: int
 
-class Coin:
-    @abstractmethod
-    def value(self):
-        ...
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
+    def __repr__(self):
+        return f'{type(self).__name__}()'
+
+class Wall(CellItem):
+    __slots__ = ()
+    code = WALL
+
+class Coin(CellItem):
+    __slots__ = ()
+    value: int
 
 class Coin1(Coin):
-    @property
-    def value(self):
-        return 1
+    __slots__ = ()
+    code = COIN1
+    value = 1
 
 class Coin2(Coin):
-    @property
-    def value(self):
-        return 2
+    __slots__ = ()
+    code = COIN2
+    value = 2
 
 class Coin3(Coin):
-    @property
-    def value(self):
-        return 3
\ No newline at end of file
+    __slots__ = ()
+    code = COIN3
+    value = 3
+
+# Value of the coin stored under each cell code, 0 for non-coin cells
+COIN_VALUES = (0, 0, 1, 2, 3, 0)
@@ -2,9 +2,12 @@
 Author: Charles Lee
 """
 
-from copy import deepcopy
 from player import Player
+import itertools
 import random
+import re
+from array import array
+from bisect import bisect_right
 from gameItems import *
 from typing import Optional
 
@@ -20,36 +23,214 @@ def getDefaultWallChoices():
     return wall
 
 
+def getWallChoices(height: int, width: int) -> list[tuple[int, int]]:
+    """
+    Wall choices for any board size: the default 10x10 layout repeated in 10x10 blocks, cut off at
+    the board's edges. Rows 0 and 9 and column 9 of every block stay free, so the blocks connect.
+    """
+    block = getDefaultWallChoices()
+    return [(x, y) for bx in range(0, height, 10) for by in range(0, width, 10)
+            for x, y in ((bx + row, by + col) for row, col in block) if x < height and y < width]
+
+
+# Shared item objects handed out by Map.get for each non-player cell code
+CELL_ITEMS = (None, Wall(), Coin1(), Coin2(), Coin3())
+CELL_NAMES = ('None', 'Wall', 'Coin1', 'Coin2', 'Coin3')
+
+# Coins are also counted per 2^BUCKET_SHIFT square block, radius and nearest queries only scan
+# the grid of blocks that hold any
+BUCKET_SHIFT = 3
+BUCKET_SIZE = 1 << BUCKET_SHIFT
+COIN_CODES = (COIN1, COIN2, COIN3)  # indexed by coin value - 1
+WALL_MASK = bytes(code == WALL for code in range(256))  # bytes.translate table, see Map.wallMask
+
+
+class MapView:
+    """
+    Read-only view over a Map's grid. A view from Map.map follows later changes to the map,
+    use Map.snapshot() for one that doesn't.
+    """
+
+    def __init__(self, height: int, width: int, cells: memoryview, players: dict[int, Player]):
+        self.__height = height
+        self.__width = width
+        self.__cells = cells
+        self.__players = players
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def width(self):
+        return self.__width
+
+    @property
+    def codes(self) -> memoryview:
+        """
+        Cell codes as a read-only 2D memoryview, index with codes[x, y]
+        """
+        return self.__cells.cast('B', (self.__height, self.__width))
+
+    def __getitem__(self, loc):
+        """
+        view[x, y] is the item at (x, y), view[x] is row x as a list of items
+        """
+        if isinstance(loc, int):
+            return [self.__item(loc * self.__width + y) for y in range(self.__width)]
+        if not (0 <= loc[0] < self.__height and 0 <= loc[1] < self.__width):
+            raise IndexError(f'{loc} is outside of the map')
+        return self.__item(loc[0] * self.__width + loc[1])
+
+    def __len__(self):
+        return self.__height
+
+    def __iter__(self):
+        for x in range(self.__height):
+            yield self[x]
+
+    def __item(self, idx: int):
+        code = self.__cells[idx]
+        return self.__players[idx] if code == PLAYER else CELL_ITEMS[code]
+
+
+class MapLayout:
+    """
+    Walls and coins of a board before any player is placed, see Map.generateLayout.
+    Holds everything a Map needs precomputed, so building a Map from it only copies bytes and deals
+    the players. A layout is used up by the Map built from it: placing the players draws from its rng.
+    """
+
+    def __init__(self, height: int, width: int, cells: bytes, takenOffsets: array, coinBuckets: bytes,
+                 numCoins: int, rng: random.Random, seed: Optional[int] = None):
+        """
+        :param cells: row-major cell codes
+        :param takenOffsets: for the n-th wall or coin in cell order, its cell index minus n, so the
+            n-th empty cell is n plus the number of offsets <= n
+        :param coinBuckets: number of coins in each BUCKET_SIZE square block, row-major
+        :param rng: generator the layout was made with, left where players are placed from
+        :param seed: seed rng was created with, games from the same seed get the same map
+        """
+        self.height = height
+        self.width = width
+        self.cells = cells
+        self.takenOffsets = takenOffsets
+        self.coinBuckets = coinBuckets
+        self.numCoins = numCoins
+        self.rng = rng
+        self.seed = seed
+
+    @classmethod
+    def fromCells(cls, height: int, width: int, cells: bytes, rng: random.Random,
+                  seed: Optional[int] = None) -> 'MapLayout':
+        """
+        Indexes a grid of walls and coins, one pass over its non-empty cells
+        """
+        assert len(cells) == height * width
+        bucketWidth = (width + BUCKET_SIZE - 1) >> BUCKET_SHIFT
+        coinBuckets = bytearray(((height + BUCKET_SIZE - 1) >> BUCKET_SHIFT) * bucketWidth)
+        # Offsets fit in 4 bytes for any board LobbyConfig allows, a pooled layout holds millions
+        takenOffsets = array('i')
+        numCoins = 0
+        for n, match in enumerate(re.finditer(b'[^\x00]', cells)):
+            idx = match.start()
+            takenOffsets.append(idx - n)
+            if COIN_VALUES[cells[idx]]:
+                x, y = divmod(idx, width)
+                coinBuckets[(x >> BUCKET_SHIFT) * bucketWidth + (y >> BUCKET_SHIFT)] += 1
+                numCoins += 1
+        return cls(height, width, cells, takenOffsets, bytes(coinBuckets), numCoins, rng, seed)
+
+
 class Map:
     COIN_MIN_RATIO = 0.1
     COIN_MAX_RATIO = 0.2
     WALL_MIN_RATIO = 0.1
     WALL_MAX_RATIO = 0.3
 
-    def __init__(self, height: int, width: int, playersList: list[Player], wallChoices: list[tuple[int]] = None):
+    def __init__(self, height: int, width: int, playersList: list[Player], wallChoices: list[tuple[int]] = None,
+                 rng: random.Random = None, layout: MapLayout = None):
+        """
+        :param rng: random number generator the map is generated with, a new one seeded from the OS when not given
+        :param layout: pre-generated walls and coins to only place the players on, generated from rng when not given
+        """
         assert isinstance(width, int) and isinstance(height, int)
         assert isinstance(playersList, list)
         self.__height = height
         self.__width = width
-        self.__map: list[list[object]] = [[None for _ in range(width)] for _ in range(height)]
+        self.__wallChoices = wallChoices
+
+        if layout is None:
+            layout = Map.generateLayout(height, width, random.Random() if rng is None else rng, wallChoices)
+        assert layout.height == height and layout.width == width
 
-        self.__numCoins = 0
+        # Row-major cell codes (see gameItems), players are kept in a side table keyed by cell index
+        self.__cells = bytearray(layout.cells)
+        self.__view = memoryview(self.__cells).toreadonly()
+        self.__players: dict[int, Player] = {}
 
-        self.wallChoices = getDefaultWallChoices() if wallChoices is None else wallChoices
+        # Coin counts kept in sync with the grid by every write, walls and coin positions are read
+        # from the grid itself, per-cell Python objects would take many times its size
+        self.__bucketWidth = (width + BUCKET_SIZE - 1) >> BUCKET_SHIFT
+        self.__coinBuckets = bytearray(layout.coinBuckets)
+        self.__numCoins = layout.numCoins
 
-        self.__fillMap(playersList)
+        self.__placePlayers(playersList, layout)
 
 
     @property
     def numCoins(self):
         return self.__numCoins
-    
-    def decreaseCoin(self):
-        self.__numCoins -= 1
 
     @property
-    def map(self):
-        return deepcopy(self.__map)
+    def wallChoices(self) -> list[tuple[int, int]]:
+        # Only built when asked for, it holds a tuple for about a third of the cells
+        if self.__wallChoices is None:
+            self.__wallChoices = getWallChoices(self.__height, self.__width)
+        return self.__wallChoices
+
+    @wallChoices.setter
+    def wallChoices(self, value: list[tuple[int, int]]):
+        self.__wallChoices = value
+
+    @property
+    def walls(self) -> frozenset[tuple[int, int]]:
+        return frozenset(self.__positionsOf(WALL))
+
+    @property
+    def players(self) -> dict[tuple[int, int], Player]:
+        return {divmod(idx, self.__width): player for idx, player in self.__players.items()}
+
+    def wallMask(self) -> bytes:
+        """
+        :return: row-major cells, 1 for walls and 0 for anything else
+        """
+        return self.__cells.translate(WALL_MASK)
+
+    def coinPositions(self, value: Optional[int] = None) -> frozenset[tuple[int, int]]:
+        """
+        :param value: only return coins of this value, all coins if None
+        """
+        codes = COIN_CODES if value is None else (COIN_CODES[value - 1],)
+        return frozenset(itertools.chain.from_iterable(self.__positionsOf(code) for code in codes))
+
+    def __positionsOf(self, code: int):
+        # Cells are found by bytes.find, which skips runs of other cells in C
+        cells, width, needle = self.__cells, self.__width, bytes((code,))
+        idx = cells.find(needle)
+        while idx != -1:
+            yield divmod(idx, width)
+            idx = cells.find(needle, idx + 1)
+
+    @property
+    def map(self) -> MapView:
+        return MapView(self.__height, self.__width, self.__view, self.__players)
+
+    def snapshot(self) -> MapView:
+        """
+        Independent copy of the current grid. Player cells still refer to the live Player objects.
+        """
+        return MapView(self.__height, self.__width, memoryview(bytes(self.__cells)), dict(self.__players))
 
     @property
     def height(self):
@@ -61,15 +242,12 @@ class Map:
 
     def __repr__(self):
         result = []
-        for row in self.__map:
+        for x in range(self.__height):
             row_str = []
-            for cell in row:
-                if cell is None:
-                    cellName = 'None'
-                elif isinstance(cell, Player):
-                    cellName = cell.name
-                else:
-                    cellName = cell.__class__.__name__
+            for y in range(self.__width):
+                idx = x * self.__width + y
+                code = self.__cells[idx]
+                cellName = self.__players[idx].name if code == PLAYER else CELL_NAMES[code]
                 row_str.append(cellName)
             result.append('\t'.join(row_str))
 
@@ -79,50 +257,211 @@ class Map:
 
     def set(self, loc: tuple[int, int], item: object):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        self.__map[loc[0]][loc[1]] = item
+        self.__put(self.__index(loc), item)
 
     def get(self, loc: tuple[int, int]):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        return self.__map[loc[0]][loc[1]]
+        return self.__item(self.__index(loc))
 
-    def __fillMap(self, players: list[Player]):
-        assert isinstance(players, list)
+    def playerAt(self, loc: tuple[int, int]) -> Optional[Player]:
+        """
+        Player at loc without the checks of get, for the engine's own cells
+        :param loc: (x, y), must be on the board
+        :return: None if no player is there
+        """
+        return self.__players.get(loc[0] * self.__width + loc[1])
+
+    def getCode(self, loc: tuple[int, int]) -> int:
+        """
+        Cell code at loc without building an item object
+        :param loc: (x, y), must be on the board
+        """
+        return self.__cells[loc[0] * self.__width + loc[1]]
+
+    def window(self, minX: int, maxX: int, minY: int, maxY: int) -> list[list[tuple[int, int]]]:
+        """
+        Collects every non-empty cell of an inclusive window in one pass over the grid rows
+        :param minX, maxX, minY, maxY: window bounds, must be on the board
+        :return: list indexed by cell code of [(x, y), ...] in row-major order
+        """
+        found = [[] for _ in range(PLAYER + 1)]
+        width = self.__width
+        for x in range(minX, maxX + 1):
+            start = x * width + minY
+            row = self.__cells[start:start + maxY - minY + 1]
+            if not row.strip(b'\x00'):
+                continue
+            for y, code in enumerate(row, minY):
+                if code:
+                    found[code].append((x, y))
+        return found
+
+    def coinsWithin(self, loc: tuple[int, int], radius: int) -> list[tuple[tuple[int, int], int]]:
+        """
+        Coins in the square of the given radius around loc, the same area getGameData covers
+        :return: [((x, y), value), ...]
+        """
+        x, y = loc
+        minX, maxX = max(x - radius, 0), min(x + radius, self.__height - 1)
+        minY, maxY = max(y - radius, 0), min(y + radius, self.__width - 1)
+        found = []
+        for bx in range(minX >> BUCKET_SHIFT, (maxX >> BUCKET_SHIFT) + 1):
+            for by in range(minY >> BUCKET_SHIFT, (maxY >> BUCKET_SHIFT) + 1):
+                if self.__coinBuckets[bx * self.__bucketWidth + by]:
+                    found.extend(self.__bucketCoins(bx, by, minX, maxX, minY, maxY))
+        return found
 
-        empty = self.__width*self.__height
+    def nearestCoin(self, loc: tuple[int, int]) -> Optional[tuple[tuple[int, int], int]]:
+        """
+        Closest coin to loc by Manhattan distance, ignoring walls. Ties go to the higher value coin.
+        Searches rings of buckets outwards from loc and stops once no closer coin can exist.
+        :return: ((x, y), value), None if no coins are left
+        """
+        if not self.__numCoins:
+            return None
+        x, y = loc
+        bx, by = x >> BUCKET_SHIFT, y >> BUCKET_SHIFT
+        lastRing = max(self.__height, self.__width) >> BUCKET_SHIFT
+        best, bestKey = None, None
+        for ring in range(lastRing + 1):
+            # Every cell in this ring is at least this far away
+            if bestKey is not None and ((ring - 1) << BUCKET_SHIFT) + 1 > bestKey[0]:
+                break
+            for bucketX, bucketY in self.__ringBuckets(bx, by, ring):
+                for coin, value in self.__bucketCoins(bucketX, bucketY):
+                    key = (abs(coin[0] - x) + abs(coin[1] - y), -value, coin)
+                    if bestKey is None or key < bestKey:
+                        best, bestKey = (coin, value), key
+        return best
 
-        maxWalls = int(Map.WALL_MAX_RATIO * empty)
-        maxWalls = maxWalls if self.wallChoices is None else len(self.wallChoices)
+    def __ringBuckets(self, bx: int, by: int, ring: int):
+        if ring == 0:
+            keys = [(bx, by)]
+        else:
+            keys = [(bx + dx, by + dy) for dx in (-ring, ring) for dy in range(-ring, ring + 1)]
+            keys += [(bx + dx, by + dy) for dy in (-ring, ring) for dx in range(1 - ring, ring)]
+        bucketHeight = len(self.__coinBuckets) // self.__bucketWidth
+        for key in keys:
+            if 0 <= key[0] < bucketHeight and 0 <= key[1] < self.__bucketWidth \
+                    and self.__coinBuckets[key[0] * self.__bucketWidth + key[1]]:
+                yield key
 
-        minWalls = int(Map.WALL_MIN_RATIO * empty)
+    def __bucketCoins(self, bx: int, by: int, minX: int = 0, maxX: int = None, minY: int = 0, maxY: int = None):
+        """
+        Coins of one bucket read from the grid, clipped to an inclusive window
+        :return: generator of ((x, y), value)
+        """
+        width = self.__width
+        maxX = self.__height - 1 if maxX is None else maxX
+        maxY = width - 1 if maxY is None else maxY
+        startY, endY = max(by << BUCKET_SHIFT, minY), min((by + 1) << BUCKET_SHIFT, maxY + 1)
+        for x in range(max(bx << BUCKET_SHIFT, minX), min((bx + 1) << BUCKET_SHIFT, maxX + 1)):
+            row = self.__cells[x * width + startY:x * width + endY]
+            for y, code in enumerate(row, startY):
+                if code and COIN_VALUES[code]:
+                    yield (x, y), COIN_VALUES[code]
+
+    def movePlayer(self, player: Player, loc: tuple[int, int]):
+        """
+        Moves player from its current cell to loc, overwriting whatever is there
+        """
+        old = player.loc[0] * self.__width + player.loc[1]
+        new = loc[0] * self.__width + loc[1]
+        self.__unindexCell(new)
+        self.__cells[old] = EMPTY
+        del self.__players[old]
+        self.__cells[new] = PLAYER
+        self.__players[new] = player
+        player._moveTo(loc)
+
+    def __index(self, loc: tuple[int, int]) -> int:
+        if not (0 <= loc[0] < self.__height and 0 <= loc[1] < self.__width):
+            raise IndexError(f'{loc} is outside of the map')
+        return loc[0] * self.__width + loc[1]
+
+    def __item(self, idx: int):
+        code = self.__cells[idx]
+        return self.__players[idx] if code == PLAYER else CELL_ITEMS[code]
+
+    def __put(self, idx: int, item: object):
+        self.__unindexCell(idx)
+        if isinstance(item, Player):
+            self.__players[idx] = item
+            self.__cells[idx] = PLAYER
+        else:
+            code = EMPTY if item is None else item.code
+            self.__cells[idx] = code
+            self.__indexCell(idx, code)
+
+    def __bucket(self, idx: int) -> int:
+        x, y = divmod(idx, self.__width)
+        return (x >> BUCKET_SHIFT) * self.__bucketWidth + (y >> BUCKET_SHIFT)
+
+    def __indexCell(self, idx: int, code: int):
+        if COIN_VALUES[code]:
+            self.__coinBuckets[self.__bucket(idx)] += 1
+            self.__numCoins += 1
+
+    def __unindexCell(self, idx: int):
+        code = self.__cells[idx]
+        if code == EMPTY:
+            return
+        if code == PLAYER:
+            del self.__players[idx]
+        elif COIN_VALUES[code]:
+            self.__coinBuckets[self.__bucket(idx)] -= 1
+            self.__numCoins -= 1
+        self.__cells[idx] = EMPTY
+
+    @staticmethod
+    def generateLayout(height: int, width: int, rng: random.Random, wallChoices: list[tuple[int]] = None,
+                       seed: Optional[int] = None) -> 'MapLayout':
+        """
+        Places walls from wallChoices, then coins from one random sample of the free cells, so
+        generation takes a bounded number of steps however full the board is
+        :param seed: recorded in the layout, the seed rng was created with
+        """
+        size = width*height
+        wallChoices = list(dict.fromkeys(getWallChoices(height, width) if wallChoices is None else wallChoices))
+
+        maxWalls = len(wallChoices)
+
+        minWalls = int(Map.WALL_MIN_RATIO * size)
         minWalls = 0 if maxWalls < minWalls else minWalls
 
-        numWalls = random.randint(minWalls, maxWalls)
-        wallChoices = deepcopy(self.wallChoices)
-        for _ in range(numWalls):
-            self.__placeRandom(Wall(), wallChoices)
-
-        # Fill players
-        for player in players:
-            player.loc = self.__placeRandom(player)
-
-        numPlayers = len(players)
-        empty = empty - numWalls - numPlayers
-
-        self.__numCoins = random.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))
-        for _ in range(self.__numCoins):
-            coin = random.choices((Coin1, Coin2, Coin3), (6,3,1))[0]()
-            self.__placeRandom(coin)
-
-    def __placeRandom(self, obj, choice: Optional[list] = None):
-        while True:
-            if choice is None:
-                x, y = random.randint(0, self.__height - 1), random.randint(0, self.__width - 1)
-            else:
-                x, y = random.choice(choice)
-                choice.remove((x,y))
-            if self.__map[x][y] is None:
-                self.__map[x][y] = obj
-                return x, y
+        numWalls = rng.randint(minWalls, maxWalls)
+        walls = sorted(x*width + y for x, y in rng.sample(wallChoices, numWalls))
+        cells = bytearray(size)
+        for idx in walls:
+            cells[idx] = WALL
+
+        empty = size - numWalls
+        numCoins = rng.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))
+
+        # Sample ranks among the free cells, the n-th free cell is n plus the number of walls before it
+        wallOffsets = [idx - i for i, idx in enumerate(walls)]
+        coinCells = [rank + bisect_right(wallOffsets, rank) for rank in rng.sample(range(empty), numCoins)]
+        coinCodes = rng.choices((COIN1, COIN2, COIN3), (6,3,1), k=numCoins)
+        for idx, code in zip(coinCells, coinCodes):
+            cells[idx] = code
+
+        # Indexed here rather than in Map, layouts are generated off the lobby's lock (see mapPool)
+        return MapLayout.fromCells(height, width, bytes(cells), rng, seed)
+
+    def __placePlayers(self, players: list[Player], layout: MapLayout):
+        """
+        Deals the players onto one random sample of the empty cells, drawn from the layout's rng
+        the same way generateLayout places coins, so it takes a bounded number of steps however
+        full the board is
+        """
+        assert isinstance(players, list)
+        takenOffsets = layout.takenOffsets
+        free = len(self.__cells) - len(takenOffsets)
+        assert len(players) <= free, f'{len(players)} players do not fit on {free} free cells'
+        for player, rank in zip(players, layout.rng.sample(range(free), len(players))):
+            idx = rank + bisect_right(takenOffsets, rank)
+            self.__put(idx, player)
+            player._moveTo(divmod(idx, self.__width))
 
 
 if __name__ == '__main__':
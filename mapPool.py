@@ -0,0 +1,167 @@
+import os
+import random
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from typing import Optional
+
+from map import Map, MapLayout
+
+
+class MapPool:
+    """
+    Keeps board layouts generated ahead of time on a background thread, so starting a game only
+    places its players. Every layout has its own seed, recorded in it for replay logs.
+    A take from an empty pool generates the layout on the caller's thread, unless the board is
+    bigger than inline_cells: then the background thread builds it and the take comes back empty,
+    the layout goes to the take's on_ready callback once it is built.
+
+    The pool tracks at most max_sizes board sizes, dropping the one taken longest ago, and keeps
+    at most max_cells cells ready across all of them.
+    """
+
+    def __init__(self, size: int = 8, refill_rate: float = None, sizes=((10, 10),), max_cells: int = 32_000_000,
+                 max_sizes: int = 8, inline_cells: int = 250_000):
+        """
+        :param size: layouts kept ready for each board size
+        :param refill_rate: most layouts generated per second in the background, unlimited when None
+        :param sizes: (height, width) of boards to fill from the start, others are added on their first take
+        :param max_cells: cells kept ready across the whole pool, a layout takes about 3 bytes per cell
+        :param max_sizes: board sizes kept ready at once
+        :param inline_cells: largest board a take generates on the caller's thread when none is ready
+        """
+        self.size = size
+        self.refill_rate = refill_rate
+        self.max_cells = max_cells
+        self.max_sizes = max_sizes
+        self.inline_cells = inline_cells
+        # Least recently taken size first
+        self.__ready: OrderedDict[tuple[int, int], deque] = OrderedDict((dims, deque()) for dims in sizes)
+        self.__deferred: set[tuple[int, int]] = set()  # sizes a take came back empty for
+        self.__waiters: dict[tuple[int, int], deque] = {}  # on_ready callbacks of empty takes, oldest first
+        self.__cond = threading.Condition()
+        self.__closed = False
+        # Instrumentation, see stats
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.generate_seconds = 0.0
+        self.take_seconds = 0.0
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Pool sized by MAP_POOL_SIZE and MAP_POOL_CELLS and limited to MAP_POOL_RATE layouts per second
+        from the environment
+        """
+        rate = os.environ.get('MAP_POOL_RATE')
+        return cls(int(os.environ.get('MAP_POOL_SIZE', 8)), float(rate) if rate else None,
+                   max_cells=int(os.environ.get('MAP_POOL_CELLS', 32_000_000)))
+
+    def take(self, height: int = 10, width: int = 10, on_ready=None) -> Optional[MapLayout]:
+        """
+        :param on_ready: callable(layout) run on the background thread with a layout built for this
+            take, when it comes back empty
+        :return: an unused layout for a height x width board, None when none is ready and the board
+            is too big to generate inline
+        """
+        start = time.perf_counter()
+        with self.__cond:
+            dims = (height, width)
+            ready = self.__ready.get(dims)
+            if ready is None:
+                ready = self.__ready[dims] = deque()
+                # Sizes someone is waiting for stay, they would never be built otherwise
+                while len(self.__ready) > self.max_sizes:
+                    oldest = next((old for old in self.__ready if not self.__waiters.get(old)), dims)
+                    if oldest == dims:
+                        break
+                    del self.__ready[oldest]
+                    self.__deferred.discard(oldest)
+            self.__ready.move_to_end(dims)
+            layout = ready.popleft() if ready else None
+            if layout is None:
+                self.misses += 1
+                if height * width > self.inline_cells and on_ready is not None:
+                    self.__waiters.setdefault(dims, deque()).append(on_ready)
+                elif height * width > self.inline_cells:
+                    self.__deferred.add(dims)
+            else:
+                self.hits += 1
+                self.__deferred.discard(dims)
+            self.__cond.notify()
+        if layout is None and height * width <= self.inline_cells:
+            layout = self.__generate(height, width)
+        with self.__cond:
+            self.take_seconds += time.perf_counter() - start
+        return layout
+
+    def stats(self) -> dict:
+        with self.__cond:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'generated': self.generated,
+                    'generate_seconds': self.generate_seconds,
+                    'take_seconds': self.take_seconds,
+                    'ready': {f'{height}x{width}': len(ready) for (height, width), ready in self.__ready.items()}}
+
+    def close(self):
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify()
+
+    def __generate(self, height: int, width: int) -> MapLayout:
+        start = time.perf_counter()
+        seed = int.from_bytes(os.urandom(8), 'little')
+        layout = Map.generateLayout(height, width, random.Random(seed), seed=seed)
+        with self.__cond:
+            self.generated += 1
+            self.generate_seconds += time.perf_counter() - start
+        return layout
+
+    def target(self, height: int, width: int) -> int:
+        """
+        :return: layouts kept ready for a height x width board, every size gets an equal share of
+            max_cells but at least one layout
+        """
+        return min(self.size, max(self.max_cells // (self.max_sizes * height * width), 1))
+
+    def __lowest(self):
+        # Board size furthest below its target that still fits in max_cells, None once every size is full
+        free = self.max_cells - sum(h * w * len(ready) for (h, w), ready in self.__ready.items())
+        # Layouts for waiting takes are handed out as soon as they are built, they never count against max_cells
+        missing = {dims: max(self.target(*dims), dims in self.__deferred) - len(ready) + len(self.__waiters.get(dims, ()))
+                   for dims, ready in self.__ready.items() if dims[0] * dims[1] <= free or self.__waiters.get(dims)}
+        dims = max(missing, key=missing.get, default=None)
+        return dims if dims is not None and missing[dims] > 0 else None
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while not self.__closed and (dims := self.__lowest()) is None:
+                    self.__cond.wait()
+                if self.__closed:
+                    return
+            layout = self.__generate(*dims)
+            with self.__cond:
+                waiters = self.__waiters.get(dims)
+                on_ready = waiters.popleft() if waiters else None
+                if waiters is not None and not waiters:
+                    del self.__waiters[dims]
+                # The size may have been dropped while its layout was generated
+                if on_ready is None and dims in self.__ready:
+                    self.__ready[dims].append(layout)
+            if on_ready is not None:
+                # A failing callback must not stop the pool
+                try:
+                    on_ready(layout)
+                except Exception:
+                    print(f"Delivering a {dims[0]}x{dims[1]} layout failed:")
+                    traceback.print_exc()
+            if self.refill_rate:
+                with self.__cond:
+                    # Sleeps on the condition so close() doesn't wait out the interval
+                    self.__cond.wait_for(lambda: self.__closed, 1 / self.refill_rate)
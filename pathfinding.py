@@ -0,0 +1,253 @@
+"""
+Path searches over what a player can see in its game_state.
+
+Searches stay inside the player's view and the board, and treat walls, teammates and enemies as
+blocked. Build the blocked set once per game_state with blocked_cells() and pass it to every search
+of that state. Paths are returned as lists of (dx, dy) steps from the player's position.
+
+When the lobby publishes its map_info, DistanceFields caches board-wide distances over the static walls.
+"""
+
+import heapq
+from array import array
+from collections import OrderedDict, deque
+from typing import Optional
+
+BOARD_HEIGHT = 10  # defaults until the lobby's board message arrives, see board_area
+BOARD_WIDTH = 10
+VISION_RADIUS = 2
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+COIN_VALUES = {'coin1': 1, 'coin2': 2, 'coin3': 3}
+
+
+def board_area(board: dict) -> dict:
+    """
+    :param board: as published on games/{lobby}/board, {height, width, vision_radius}
+    :return: the radius, height and width the searches take as area
+    """
+    return {'radius': board['vision_radius'], 'height': board['height'], 'width': board['width']}
+
+
+def blocked_cells(game_state) -> set:
+    """
+    Cells no player can move into: walls, teammates and enemies
+    """
+    blocked = set()
+    for key in ('walls', 'teammatePositions', 'enemyPositions'):
+        blocked.update(map(tuple, game_state[key]))
+    return blocked
+
+
+def search_bounds(game_state, radius: int = VISION_RADIUS, height: int = BOARD_HEIGHT, width: int = BOARD_WIDTH):
+    """
+    :return: (minX, maxX, minY, maxY) of the cells in view that are on the board
+    """
+    x, y = game_state['currentPosition']
+    return max(x - radius, 0), min(x + radius, height - 1), max(y - radius, 0), min(y + radius, width - 1)
+
+
+def is_open(pos, bounds, blocked: set) -> bool:
+    minX, maxX, minY, maxY = bounds
+    return minX <= pos[0] <= maxX and minY <= pos[1] <= maxY and pos not in blocked
+
+
+def manhattan(pos, dest) -> int:
+    return abs(pos[0] - dest[0]) + abs(pos[1] - dest[1])
+
+
+def find_path(game_state, target, blocked: set = None, **area) -> Optional[list]:
+    """
+    A* from the player to target
+    :param blocked: blocked_cells(game_state), computed when not given
+    :param area: radius, height and width passed on to search_bounds
+    :return: the steps to target, None if it can't be reached
+    """
+    blocked = blocked_cells(game_state) if blocked is None else blocked
+    bounds = search_bounds(game_state, **area)
+    start = tuple(game_state['currentPosition'])
+    target = tuple(target)
+    if start == target:
+        return []
+
+    parents = {start: None}
+    cost = {start: 0}
+    # (f, g, pos), positions are unique per g so ties never compare further
+    frontier = [(manhattan(start, target), 0, start)]
+    while frontier:
+        _, g, pos = heapq.heappop(frontier)
+        if g > cost[pos]:
+            continue  # stale entry, pos was reached cheaper since
+        for dx, dy in DIRECTIONS:
+            nxt = (pos[0] + dx, pos[1] + dy)
+            if nxt == target:
+                parents[nxt] = pos
+                return path_to(parents, nxt)
+            if (nxt not in cost or g + 1 < cost[nxt]) and is_open(nxt, bounds, blocked):
+                cost[nxt] = g + 1
+                parents[nxt] = pos
+                heapq.heappush(frontier, (g + 1 + manhattan(nxt, target), g + 1, nxt))
+    return None
+
+
+def best_coin(game_state, blocked: set = None, **area):
+    """
+    Breadth first search from the player over every visible coin at once, picks the most valuable
+    reachable coin and the closest of those
+    :param blocked: blocked_cells(game_state), computed when not given
+    :param area: radius, height and width passed on to search_bounds
+    :return: (coin, steps) or (None, None) when no coin can be reached
+    """
+    coins = {tuple(pos): value for key, value in COIN_VALUES.items() for pos in game_state[key]}
+    if not coins:
+        return None, None
+    blocked = blocked_cells(game_state) if blocked is None else blocked
+    bounds = search_bounds(game_state, **area)
+    start = tuple(game_state['currentPosition'])
+    top = max(coins.values())
+
+    best = None
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        pos = queue.popleft()
+        value = coins.get(pos)
+        if value is not None and pos != start and (best is None or value > coins[best]):
+            best = pos
+            if value == top:
+                break  # nothing closer is worth more
+        for dx, dy in DIRECTIONS:
+            nxt = (pos[0] + dx, pos[1] + dy)
+            if nxt not in parents and is_open(nxt, bounds, blocked):
+                parents[nxt] = pos
+                queue.append(nxt)
+
+    if best is None:
+        return None, None
+    return best, path_to(parents, best)
+
+
+def view_cells(game_state, **area) -> set:
+    """
+    :param area: radius, height and width passed on to search_bounds
+    :return: every cell in view that is on the board
+    """
+    minX, maxX, minY, maxY = search_bounds(game_state, **area)
+    return {(x, y) for x in range(minX, maxX + 1) for y in range(minY, maxY + 1)}
+
+
+def distance_field(start, passable: set):
+    """
+    Breadth first search from start over the cells in passable
+    :return: (distances, parents) of every reachable cell, pass parents to path_to for the steps
+    """
+    start = tuple(start)
+    distances = {start: 0}
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        pos = queue.popleft()
+        for dx, dy in DIRECTIONS:
+            nxt = (pos[0] + dx, pos[1] + dy)
+            if nxt not in parents and nxt in passable:
+                distances[nxt] = distances[pos] + 1
+                parents[nxt] = pos
+                queue.append(nxt)
+    return distances, parents
+
+
+def path_to(parents: dict, pos) -> list:
+    steps = []
+    while parents[pos] is not None:
+        prev = parents[pos]
+        steps.append((pos[0] - prev[0], pos[1] - prev[1]))
+        pos = prev
+    steps.reverse()
+    return steps
+
+
+class DistanceFields:
+    """
+    Distances to a target from every cell of the board, over the walls that never move, computed
+    once per target and cached. Path searches become a table lookup plus a check for the players
+    in the way this turn.
+
+    Coins stay put until taken, so a target's field is reused turn after turn. Share one instance
+    between every planner of a lobby (see TeamPlanner.use_distances): teams chasing the same coins
+    reuse each other's fields. The cache keeps the most recently used fields, up to max_cells cells
+    in total and at least one field, and planners split those between them.
+    """
+
+    def __init__(self, height: int, width: int, walls, max_cells: int = 4_000_000):
+        self.height = height
+        self.width = width
+        self.walls = {tuple(wall) for wall in walls}
+        # 1 for each wall cell, a search starts from a copy and marks the cells it reaches
+        self.blocked = bytearray(height * width)
+        for x, y in self.walls:
+            self.blocked[x * width + y] = 1
+        self.max_fields = max(max_cells // (height * width), 1)
+        self.fields = OrderedDict()
+        self.planners = 0  # planners sharing the cache, see TeamPlanner.use_distances
+
+    @classmethod
+    def from_map_info(cls, map_info: dict) -> 'DistanceFields':
+        # map_info as published on games/{lobby}/map_info, see Game.getMapInfo
+        return cls(map_info['height'], map_info['width'], map_info['walls'])
+
+    def field(self, target) -> array:
+        """
+        :return: row-major distances from every cell to target, -1 where target can't be reached
+        """
+        target = tuple(target)
+        field = self.fields.get(target)
+        if field is not None:
+            self.fields.move_to_end(target)
+            return field
+
+        height, width = self.height, self.width
+        size = height * width
+        field = array('i', [-1]) * size
+        if 0 <= target[0] < height and 0 <= target[1] < width and target not in self.walls:
+            # Breadth-first over flat cell indexes one distance at a time, no tuples per cell
+            seen = bytearray(self.blocked)
+            start = target[0] * width + target[1]
+            seen[start] = 1
+            field[start] = 0
+            frontier, distance = [start], 0
+            while frontier:
+                distance += 1
+                reached = []
+                for idx in frontier:
+                    y = idx % width
+                    for near in (idx - width if idx >= width else -1, idx + width if idx + width < size else -1,
+                                 idx - 1 if y else -1, idx + 1 if y + 1 < width else -1):
+                        if near >= 0 and not seen[near]:
+                            seen[near] = 1
+                            field[near] = distance
+                            reached.append(near)
+                frontier = reached
+        self.fields[target] = field
+        if len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+    def distance(self, pos, target) -> Optional[int]:
+        distance = self.field(target)[pos[0] * self.width + pos[1]]
+        return None if distance < 0 else distance
+
+    def next_step(self, pos, target, blocked: set = frozenset()):
+        """
+        :param blocked: cells taken this turn, e.g. by other players
+        :return: a (dx, dy) step from pos along a shortest path to target that isn't blocked, None if there is none
+        """
+        field, width = self.field(target), self.width
+        distance = field[pos[0] * width + pos[1]]
+        if distance <= 0:
+            return None
+        for dx, dy in DIRECTIONS:
+            nx, ny = pos[0] + dx, pos[1] + dy
+            if 0 <= nx < self.height and 0 <= ny < width and field[nx * width + ny] == distance - 1 \
+                    and (nx, ny) not in blocked:
+                return dx, dy
+        return None
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Player:
+    __slots__ = ('__name', '__team', '__loc')
+
     def __init__(self, playerName: str, team: Team):
         assert isinstance(playerName, str)
 
@@ -32,3 +34,7 @@ class Player:
     def loc(self, value: tuple[int,int]):
         assert isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], int) and isinstance(value[1], int)
         self.__loc = value
+
+    def _moveTo(self, loc: tuple[int,int]):
+        # Unchecked loc setter for the engine, which only moves players to cells on its map
+        self.__loc = loc
@@ -0,0 +1,158 @@
+"""
+Replay logs: everything needed to play a lobby's game again, the map seed, the teams and every
+turn's moves, appended to one file per lobby as the game runs.
+
+A log is a header followed by records, all little-endian:
+    header  magic 'CGRL', version u8, seed u64, height u16, width u16, team count u16,
+            per team its name then its player count u16 and player names (names are u16 length + utf-8)
+    turn    record type 1, move count u16, per move the player's index in team order u16 and a move code u8
+    end     record type 2, per team its final score i32
+
+Run with: python replay.py log ... to re-simulate logs and check their final scores.
+"""
+
+import struct
+import sys
+import time
+
+from game import Game
+from moveset import Moveset
+
+MAGIC = b'CGRL'
+# 2: players are placed after the walls and coins, see Map.generateLayout
+# 3: players are dealt from a sample of the empty cells
+# 4: counts, player indexes and name lengths are u16
+VERSION = 4
+
+RECORD_TURN = 1
+RECORD_END = 2
+
+MOVES = (Moveset.UP, Moveset.DOWN, Moveset.LEFT, Moveset.RIGHT)
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+
+HEADER = struct.Struct('<4sBQHHH')  # magic, version, seed, height, width, team count
+TURN = struct.Struct('<BH')  # record type, move count
+MOVE = struct.Struct('<HB')  # player index, move code
+COUNT = struct.Struct('<H')  # player count of a team, length of a name
+SCORE = struct.Struct('<i')
+BUFFER_SIZE = 64 * 1024
+
+
+class ReplayWriter:
+    """
+    Appends one lobby's game to a binary file object, see open_replay
+    """
+
+    def __init__(self, file, seed: int, teams: dict, height: int = 10, width: int = 10):
+        """
+        :param teams: {team_name: [player_name, ...]} as passed to Game
+        """
+        self.file = file
+        self.teams = list(teams)
+        self.players = {name: i for i, name in enumerate(name for names in teams.values() for name in names)}
+        parts = [HEADER.pack(MAGIC, VERSION, seed, height, width, len(teams))]
+        for team, names in teams.items():
+            parts.append(encode_name(team) + COUNT.pack(len(names)) + b''.join(map(encode_name, names)))
+        file.write(b''.join(parts))
+
+    def turn(self, moves: dict):
+        """
+        :param moves: {player_name: Moveset} as passed to Game.resolveTurn
+        """
+        record = [TURN.pack(RECORD_TURN, len(moves))]
+        record.extend(MOVE.pack(self.players[name], MOVE_CODES[move]) for name, move in moves.items())
+        self.file.write(b''.join(record))
+
+    def end(self, scores: dict):
+        """
+        Records the final scores and closes the log
+        """
+        self.file.write(bytes([RECORD_END]) + b''.join(SCORE.pack(scores[team]) for team in self.teams))
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+
+def open_replay(path: str, seed: int, teams: dict, height: int = 10, width: int = 10) -> ReplayWriter:
+    return ReplayWriter(open(path, 'ab', buffering=BUFFER_SIZE), seed, teams, height, width)
+
+
+def read_replay(data: bytes) -> dict:
+    """
+    :return: {'seed': int, 'height': int, 'width': int, 'teams': {team_name: [player_name, ...]},
+              'turns': [{player_name: Moveset}, ...], 'scores': {team_name: score} or None if the log has no end}
+    """
+    magic, version, seed, height, width, numTeams = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a version {VERSION} replay log')
+    offset = HEADER.size
+    teams = {}
+    for _ in range(numTeams):
+        team, offset = decode_name(data, offset)
+        (count,), offset = COUNT.unpack_from(data, offset), offset + COUNT.size
+        teams[team] = []
+        for _ in range(count):
+            name, offset = decode_name(data, offset)
+            teams[team].append(name)
+    players = [name for names in teams.values() for name in names]
+
+    turns, scores = [], None
+    while offset < len(data):
+        if data[offset] == RECORD_TURN:
+            _, count = TURN.unpack_from(data, offset)
+            offset += TURN.size
+            moves = {}
+            for _ in range(count):
+                player, code = MOVE.unpack_from(data, offset)
+                offset += MOVE.size
+                moves[players[player]] = MOVES[code]
+            turns.append(moves)
+        elif data[offset] == RECORD_END:
+            values = struct.unpack_from(f'<{numTeams}i', data, offset + 1)
+            scores = dict(zip(teams, values))
+            break
+        else:
+            raise ValueError(f'unknown replay record {data[offset]} at byte {offset}')
+    return {'seed': seed, 'height': height, 'width': width, 'teams': teams, 'turns': turns, 'scores': scores}
+
+
+def replay_game(log: dict) -> Game:
+    """
+    Plays a log's turns through a fresh Game built the way start_game builds it
+    """
+    game = Game(log['teams'], log['width'], log['height'], seed=log['seed'])
+    for moves in log['turns']:
+        game.resolveTurn(moves)
+    return game
+
+
+def encode_name(name: str) -> bytes:
+    name = name.encode()
+    return COUNT.pack(len(name)) + name
+
+
+def decode_name(data: bytes, offset: int):
+    (length,) = COUNT.unpack_from(data, offset)
+    start = offset + COUNT.size
+    return data[start:start + length].decode(), start + length
+
+
+if __name__ == '__main__':
+    failures = 0
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as file:
+            log = read_replay(file.read())
+        start = time.perf_counter()
+        game = replay_game(log)
+        elapsed = time.perf_counter() - start
+        scores = game.getScores()
+        if log['scores'] is None:
+            status = 'INCOMPLETE'
+        elif scores == log['scores']:
+            status = 'OK'
+        else:
+            status = f"MISMATCH, logged {log['scores']}"
+            failures += 1
+        print(f"{path}: {len(log['turns'])} turns in {elapsed * 1e3:.1f} ms, scores {scores} {status}")
+    sys.exit(1 if failures else 0)
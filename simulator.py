@@ -0,0 +1,188 @@
+"""
+Headless simulation: plays games by driving Game directly with bot policies, no broker involved.
+
+A policy factory takes a random.Random and returns a policy, a callable taking one team's
+{playerName: gameState} and returning {playerName: move command} with commands 'UP', 'DOWN', 'LEFT',
+'RIGHT' or None to stay put. A fresh policy is built for every game and plays both teams.
+Policies with a useBoard method are told the board size and vision radius before the first turn.
+
+Run with: python simulator.py [policy] [games]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from game import Game
+from moveset import Moveset
+
+DEFAULT_TEAMS = {'alpha': ['Alex', 'Jake'], 'beta': ['Ben', 'Alice']}
+COMMANDS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+
+
+def randomPolicy(rng: random.Random):
+    return lambda gameStates: {name: rng.choice(COMMANDS) for name in gameStates}
+
+
+class AstarPolicy:
+    """
+    The bot from Challenge3: every player chases its own best visible coin, momentum random walk otherwise
+    """
+
+    def __init__(self, rng: random.Random):
+        from Challenge3 import CoinChaser
+        self.chaser = CoinChaser(rng)
+
+    def useBoard(self, board: dict):
+        self.chaser.use_board(board)
+
+    def __call__(self, gameStates: dict) -> dict:
+        return {name: self.chaser.choose_move(name, state) for name, state in gameStates.items()}
+
+
+class TeamPolicy:
+    """
+    Coins matched to players over the team's merged view, same random walk for players without one
+    """
+
+    def __init__(self, rng: random.Random):
+        from Challenge3 import CoinChaser
+        from coordinator import TeamPlanner
+        self.chaser = CoinChaser(rng)
+        self.planner = TeamPlanner(self.chaser)
+
+    def useBoard(self, board: dict):
+        self.chaser.use_board(board)
+        self.planner.use_board(board)
+
+    def __call__(self, gameStates: dict) -> dict:
+        return self.planner.plan(gameStates)
+
+
+class MemoryPolicy:
+    """
+    The team planner with a TeamMemory per team, remembering the board and exploring unseen cells
+    """
+
+    def __init__(self, rng: random.Random):
+        from Challenge3 import CoinChaser
+        self.chaser = CoinChaser(rng)
+        self.planners = {}
+        self.board = None
+
+    def useBoard(self, board: dict):
+        self.board = board
+        self.chaser.use_board(board)
+
+    def newPlanner(self):
+        from coordinator import TeamPlanner
+        from teamMemory import TeamMemory
+        planner = TeamPlanner(self.chaser, TeamMemory())
+        if self.board is not None:
+            planner.use_board(self.board)
+        return planner
+
+    def __call__(self, gameStates: dict) -> dict:
+        team = frozenset(gameStates)
+        if team not in self.planners:
+            self.planners[team] = self.newPlanner()
+        return self.planners[team].plan(gameStates)
+
+
+class StaticMapPolicy(MemoryPolicy):
+    """
+    MemoryPolicy planning with distance fields cached over the walls of the map info, playGame hands
+    the map info to any policy with a useMapInfo method like a lobby with map_info turned on.
+    Every team's planner shares the same fields.
+    """
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        self.distances = None
+
+    def useMapInfo(self, mapInfo: dict):
+        from pathfinding import DistanceFields
+
+        self.distances = DistanceFields.from_map_info(mapInfo)
+
+    def newPlanner(self):
+        planner = super().newPlanner()
+        planner.use_distances(self.distances)
+        return planner
+
+
+POLICIES = {
+    'random': randomPolicy,
+    'astar': AstarPolicy,
+    'team': TeamPolicy,
+    'memory': MemoryPolicy,
+    'static_map': StaticMapPolicy,
+}
+
+
+def playGame(teams: dict[str, list[str]], policyFactory, seed: int, width: int = 10, height: int = 10,
+             visionRadius: int = 2, maxTurns: int = 1000) -> dict:
+    """
+    Plays one game the way the server runs a lobby: every player picks a move from the state sent
+    after the previous turn, then all moves are applied.
+    :return: {'turns': int, 'finished': bool, 'scores': {teamName: score}}
+    """
+    game = Game(teams, width, height, seed=seed)
+    policy = policyFactory(random.Random(seed))
+    # Policies get the board and map info the way a lobby publishes them, the board first
+    if hasattr(policy, 'useBoard'):
+        policy.useBoard({'height': height, 'width': width, 'vision_radius': visionRadius})
+    if hasattr(policy, 'useMapInfo'):
+        policy.useMapInfo(game.getMapInfo())
+
+    turns = 0
+    while not game.gameOver() and turns < maxTurns:
+        commands = {}
+        for names in teams.values():
+            commands.update(policy({name: game.getGameData(name, visionRadius, checked=False) for name in names}))
+        moves = {name: Moveset[command] for name, command in commands.items() if command is not None}
+        game.resolveTurn(moves, checked=False)
+        turns += 1
+
+    return {'turns': turns, 'finished': game.gameOver(), 'scores': game.getScores()}
+
+
+def runBatch(policyFactory, numGames: int, seed: int = 0, teams: dict[str, list[str]] = None, **gameOptions) -> dict:
+    """
+    Plays numGames games with seeds seed, seed+1, ... and summarises them
+    :param gameOptions: passed on to playGame
+    """
+    teams = DEFAULT_TEAMS if teams is None else teams
+    start = time.perf_counter()
+    results = [playGame(teams, policyFactory, seed + i, **gameOptions) for i in range(numGames)]
+    elapsed = time.perf_counter() - start
+
+    turns = [result['turns'] for result in results]
+    scores = {team: [result['scores'][team] for result in results] for team in teams}
+    return {
+        'games': numGames,
+        'seconds': elapsed,
+        'gamesPerSecond': numGames / elapsed,
+        'turnsPerSecond': sum(turns) / elapsed,
+        'finished': sum(result['finished'] for result in results),
+        'turnsPerGame': {'mean': statistics.mean(turns), 'median': statistics.median(turns),
+                         'min': min(turns), 'max': max(turns)},
+        'scores': {team: {'mean': statistics.mean(values), 'stdev': statistics.pstdev(values),
+                          'min': min(values), 'max': max(values)} for team, values in scores.items()},
+    }
+
+
+def printReport(report: dict):
+    print(f"{report['games']} games in {report['seconds']:.2f}s: {report['gamesPerSecond']:.1f} games/s, "
+          f"{report['turnsPerSecond']:.0f} turns/s, {report['finished']} finished")
+    turns = report['turnsPerGame']
+    print(f"turns/game: mean {turns['mean']:.1f}, median {turns['median']}, min {turns['min']}, max {turns['max']}")
+    for team, score in report['scores'].items():
+        print(f"{team}: mean {score['mean']:.2f} +/- {score['stdev']:.2f}, min {score['min']}, max {score['max']}")
+
+
+if __name__ == '__main__':
+    policyName = sys.argv[1] if len(sys.argv) > 1 else 'astar'
+    numGames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    printReport(runBatch(POLICIES[policyName], numGames))
@@ -0,0 +1,69 @@
+"""
+Incremental game_state messages for lobbies running in delta mode.
+
+A full snapshot is the Game.getGameData dict tagged with kind 'full'. A delta carries
+the player's current position, the positions added to and removed from each position
+list since the previous message, and the teammate lists only when they changed.
+"""
+
+POSITION_KEYS = ('enemyPositions', 'coin1', 'coin2', 'coin3', 'walls')
+
+
+def make_keyframe(game_data: dict) -> dict:
+    return dict(game_data, kind='full')
+
+
+def diff_game_data(old: dict, new: dict) -> dict:
+    """
+    Computes the delta that turns the game data old into new
+    :param old: game data previously sent to the player
+    :param new: current game data of the player
+    """
+    delta = {'kind': 'delta', 'currentPosition': new['currentPosition']}
+    added, removed = {}, {}
+    for key in POSITION_KEYS:
+        before, after = set(old[key]), set(new[key])
+        if before == after:
+            continue
+        new_positions = [pos for pos in new[key] if pos not in before]
+        old_positions = [pos for pos in old[key] if pos not in after]
+        if new_positions:
+            added[key] = new_positions
+        if old_positions:
+            removed[key] = old_positions
+    if added:
+        delta['added'] = added
+    if removed:
+        delta['removed'] = removed
+    if old['teammateNames'] != new['teammateNames'] or old['teammatePositions'] != new['teammatePositions']:
+        delta['teammateNames'] = new['teammateNames']
+        delta['teammatePositions'] = new['teammatePositions']
+    return delta
+
+
+def apply_game_state(state, message: dict):
+    """
+    Applies a decoded game_state message to the last state a client holds
+    :param state: previous game state, None if nothing was received yet
+    :param message: plain snapshot, keyframe or delta
+    :return: the new game state, or None if a delta arrived without a base state
+    """
+    kind = message.pop('kind', 'full')
+    if kind == 'full':
+        return message
+    if state is None:
+        return None
+
+    state = dict(state)
+    state['currentPosition'] = message['currentPosition']
+    added, removed = message.get('added', {}), message.get('removed', {})
+    for key in POSITION_KEYS:
+        if key in removed:
+            gone = {tuple(pos) for pos in removed[key]}
+            state[key] = [pos for pos in state[key] if tuple(pos) not in gone]
+        if key in added:
+            state[key] = state[key] + added[key]
+    if 'teammateNames' in message:
+        state['teammateNames'] = message['teammateNames']
+        state['teammatePositions'] = message['teammatePositions']
+    return state
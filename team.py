@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Team:
+    __slots__ = ('__name', 'players', '__score')
+
     def __init__(self, teamName: str):
         assert isinstance(teamName, str)
         self.__name = teamName
@@ -30,3 +32,7 @@ class Team:
     def increaseScore(self, value: int):
         assert isinstance(value, int)
         self.__score += value
+
+    def _addScore(self, value: int):
+        # Unchecked increaseScore for the engine's coin pickups
+        self.__score += value
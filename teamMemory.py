@@ -0,0 +1,66 @@
+"""
+A team's knowledge of the board, built up across turns from every teammate's game_state.
+
+Each turn the windows the players see overwrite what the team knew about those cells: walls stay
+walls, coins appear and disappear, enemies are remembered with the turn they were last seen. Cells
+nobody has seen yet that border known free cells form the frontier, the places worth exploring.
+"""
+
+import pathfinding
+
+
+class TeamMemory:
+
+    def __init__(self, height: int = pathfinding.BOARD_HEIGHT, width: int = pathfinding.BOARD_WIDTH,
+                 radius: int = pathfinding.VISION_RADIUS):
+        self.height = height
+        self.width = width
+        self.radius = radius
+        self.turn = 0
+        self.seen = {}  # cell -> turn it was last in someone's view
+        self.walls = set()
+        self.coins = {}  # cell -> coin value
+        self.enemies = {}  # cell -> turn an enemy was last seen there
+        self.players = set()  # cells holding a player this turn
+
+    def update(self, states: dict):
+        """
+        Merges one turn of the team's game_states
+        :param states: {player_name: game_state}, all from the same turn
+        """
+        self.turn += 1
+        self.players = set()
+        area = {'radius': self.radius, 'height': self.height, 'width': self.width}
+        for state in states.values():
+            view = pathfinding.view_cells(state, **area)
+            for cell in view:
+                self.seen[cell] = self.turn
+                self.coins.pop(cell, None)
+                self.enemies.pop(cell, None)
+            self.walls.update(map(tuple, state['walls']))
+            for key, value in pathfinding.COIN_VALUES.items():
+                self.coins.update((tuple(pos), value) for pos in state[key])
+            for pos in state['enemyPositions']:
+                self.enemies[tuple(pos)] = self.turn
+            position = tuple(state['currentPosition'])
+            self.players.add(position)
+            self.players.update(map(tuple, state['teammatePositions']))
+            self.players.update(map(tuple, state['enemyPositions']))
+
+    def passable(self) -> set:
+        """
+        Known cells a player could move into this turn
+        """
+        return set(self.seen) - self.walls - self.players
+
+    def frontier(self) -> set:
+        """
+        Unseen cells on the board next to a known free cell
+        """
+        frontier = set()
+        for x, y in set(self.seen) - self.walls:
+            for dx, dy in pathfinding.DIRECTIONS:
+                cell = (x + dx, y + dy)
+                if cell not in self.seen and 0 <= cell[0] < self.height and 0 <= cell[1] < self.width:
+                    frontier.add(cell)
+        return frontier
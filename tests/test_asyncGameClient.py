@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('paho')
+
+from AsyncGameClient import AsyncGameServer
+
+
+def test_server_survives_bad_messages_and_plays_turns():
+    published = []
+    server = AsyncGameServer(published.extend)
+
+    async def main():
+        server.loop = asyncio.get_running_loop()
+        for player, team in (('a', 'A'), ('b', 'B')):
+            server.submit('new_game', json.dumps({'lobby_name': 'L', 'team_name': team, 'player_name': player}).encode())
+        server.submit('games/L/start', b'\xff')
+        server.submit('games/L/start', b'START')
+        server.submit('games/L/a/move', b'JUMP')
+        server.submit('games/L/a/move', b'UP')
+        server.submit('games/L/b/move', b'DOWN')
+        server.loop.call_later(0.5, server.stop)
+        await server.serve()
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.shutdown()
+    topics = [topic for topic, _ in published]
+    assert 'games/L/board' in topics
+    assert ('games/L/lobby', 'Error: JUMP is not a valid move.') in published
+    assert topics.count('games/L/scores') == 1
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from batchedGame import BatchedGame
+from game import Game
+from moveset import Moveset
+
+TEAMS = {'A': ['a1', 'a2', 'a3'], 'B': ['b1', 'b2', 'b3']}
+
+
+def makeGames(numGames, size=6):
+    return [Game(TEAMS, size, size, seed=seed) for seed in range(numGames)]
+
+
+@pytest.mark.parametrize('size', [5, 6, 10])
+def test_step_matches_resolveTurn(size):
+    numGames, turns = 40, 60
+    games = makeGames(numGames, size)
+    batch = BatchedGame.fromGames(makeGames(numGames, size))
+    names = batch.playerNames
+    rng = random.Random(size)
+
+    for _ in range(turns):
+        moves = [rng.choice((None,) + tuple(Moveset)) for _ in range(numGames * len(names))]
+        for g, game in enumerate(games):
+            if not game.gameOver():
+                game.resolveTurn({name: moves[g * len(names) + p] for p, name in enumerate(names)
+                                  if moves[g * len(names) + p] is not None})
+        batch.step(moves)
+
+    for g, game in enumerate(games):
+        assert batch.getScores(g) == game.getScores()
+        assert batch.numCoins(g) == game.map.numCoins
+        assert [batch.playerLoc(g, name) for name in names] == [game.all_players[name].loc for name in names]
+        assert batch.codes(g).tobytes() == game.map.map.codes.tobytes()
+
+
+def test_step_leaves_swaps_in_place():
+    # Find a map where a1 has a player right below it, then make the two swap
+    for seed in range(1000):
+        game = Game(TEAMS, 5, 5, seed=seed)
+        x, y = game.all_players['a1'].loc
+        below = [name for name, player in game.all_players.items() if player.loc == (x + 1, y)]
+        if below:
+            break
+    batch = BatchedGame.fromGames([game])
+    moves = [Moveset.DOWN if name == 'a1' else Moveset.UP if name == below[0] else None for name in batch.playerNames]
+    batch.step(moves)
+    game.resolveTurn({'a1': Moveset.DOWN, below[0]: Moveset.UP})
+    assert batch.playerLoc(0, 'a1') == game.all_players['a1'].loc == (x, y)
+    assert batch.playerLoc(0, below[0]) == game.all_players[below[0]].loc == (x + 1, y)
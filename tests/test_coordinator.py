@@ -0,0 +1,72 @@
+import itertools
+import random
+
+from coordinator import COMMANDS, TeamCoordinator, TeamPlanner, min_cost_assignment
+from pathfinding import DistanceFields
+
+
+def bruteForce(costs):
+    n, m = len(costs), len(costs[0])
+    return min(sum(costs[row][col] for row, col in enumerate(cols)) for cols in itertools.permutations(range(m), n))
+
+
+def test_assignment_is_optimal():
+    rng = random.Random(0)
+    for _ in range(200):
+        n = rng.randint(1, 4)
+        m = rng.randint(n, 6)
+        costs = [[rng.randint(-5, 20) for _ in range(m)] for _ in range(n)]
+        assignment = min_cost_assignment(costs)
+        assert len(set(assignment)) == n
+        assert sum(costs[row][col] for row, col in enumerate(assignment)) == bruteForce(costs)
+
+
+def test_assign_gives_teammates_distinct_targets():
+    positions = {'a': (0, 0), 'b': (0, 4)}
+    targets = {(0, 1): 0, (0, 3): 0}
+    distance = lambda player, cell: abs(positions[player][1] - cell[1])
+    step = lambda player, cell: (0, 1) if cell[1] > positions[player][1] else (0, -1)
+    assert TeamPlanner.assign(['a', 'b'], targets, distance, step) == {'a': COMMANDS[(0, 1)], 'b': COMMANDS[(0, -1)]}
+
+
+def test_assign_leaves_players_without_reachable_targets():
+    targets = {(5, 5): 0}
+    assert TeamPlanner.assign(['a', 'b'], targets, lambda player, cell: None, lambda player, cell: (1, 0)) == {}
+    # Only one target, the closer player takes it and the other is left for the wanderer
+    distance = lambda player, cell: {'a': 3, 'b': 1}[player]
+    assert TeamPlanner.assign(['a', 'b'], targets, distance, lambda player, cell: (1, 0)) == {'b': 'DOWN'}
+
+
+def test_coordinator_plans_once_the_whole_team_reported():
+    published = []
+
+    class Planner:
+        def __init__(self):
+            self.calls = []
+
+        def plan(self, states):
+            self.calls.append(dict(states))
+            return {player: 'UP' for player in states}
+
+    planner = Planner()
+    coordinator = TeamCoordinator(['a', 'b'], planner, lambda player, command: published.append((player, command)))
+    coordinator.on_game_state('a', {'turn': 1})
+    assert published == [] and planner.calls == []
+    coordinator.on_game_state('a', {'turn': 1, 'again': True})
+    assert planner.calls == []
+    coordinator.on_game_state('b', {'turn': 1})
+    assert planner.calls == [{'a': {'turn': 1, 'again': True}, 'b': {'turn': 1}}]
+    assert sorted(published) == [('a', 'UP'), ('b', 'UP')]
+    # The next turn starts from an empty set of states
+    coordinator.on_game_state('b', {'turn': 2})
+    assert len(planner.calls) == 1
+
+
+def test_planners_split_the_shared_fields():
+    distances = DistanceFields(10, 10, [], max_cells=600)
+    planners = [TeamPlanner(None, distances=distances), TeamPlanner(None, distances=distances)]
+    assert distances.planners == 2 and all(planner.distances is distances for planner in planners)
+    positions = {'a': (0, 0), 'b': (9, 9)}
+    targets = {(x, x): 0 for x in range(10)}
+    # 6 fields between 2 planners, each keeps the 3 targets closest to any of its players
+    assert planners[0].nearest_targets(targets, positions) == {(0, 0): 0, (9, 9): 0, (1, 1): 0}
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from game import Game
+from gameItems import EMPTY, Coin1, Coin3, Wall
+from map import MapLayout
+from moveset import Moveset
+
+UP, DOWN, LEFT, RIGHT = Moveset.UP, Moveset.DOWN, Moveset.LEFT, Moveset.RIGHT
+SIZE = 6
+PARKING_ROW = SIZE - 1  # kept free of targets so players can be shuffled through it
+
+
+def arranged(teams: dict, positions: dict, walls=(), coins=()) -> Game:
+    """
+    Game on an empty SIZE x SIZE board with every player moved to its position
+    :param positions: {playerName: (x, y)}, rows before PARKING_ROW
+    """
+    layout = MapLayout.fromCells(SIZE, SIZE, bytes(SIZE * SIZE), random.Random(0))
+    game = Game(teams, layout=layout)
+    for player in game.all_players.values():
+        parking = next((PARKING_ROW, y) for y in range(SIZE) if game.map.getCode((PARKING_ROW, y)) == EMPTY)
+        if player.loc[0] != PARKING_ROW:
+            game.map.movePlayer(player, parking)
+    for name, loc in positions.items():
+        game.map.movePlayer(game.all_players[name], loc)
+    for loc in walls:
+        game.map.set(loc, Wall())
+    for loc, item in coins:
+        game.map.set(loc, item)
+    return game
+
+
+def locations(game: Game) -> dict:
+    return {name: player.loc for name, player in game.all_players.items()}
+
+
+def test_conflict_goes_to_the_first_name_and_its_coin():
+    game = arranged({'A': ['a'], 'B': ['b']}, {'a': (1, 0), 'b': (1, 2)}, coins=[((1, 1), Coin3())])
+    game.resolveTurn({'b': LEFT, 'a': RIGHT})
+    assert locations(game) == {'a': (1, 1), 'b': (1, 2)}
+    assert game.getScores() == {'A': 3, 'B': 0}
+
+
+def test_outcome_does_not_depend_on_move_order():
+    moves = {'a': RIGHT, 'b': LEFT, 'c': UP}
+    results = []
+    for order in (['a', 'b', 'c'], ['c', 'b', 'a'], ['b', 'c', 'a']):
+        game = arranged({'A': ['a', 'c'], 'B': ['b']}, {'a': (1, 0), 'b': (1, 2), 'c': (2, 1)})
+        game.resolveTurn({name: moves[name] for name in order})
+        results.append(locations(game))
+    assert results[0] == results[1] == results[2]
+
+
+def test_follower_moves_into_a_cell_being_left():
+    game = arranged({'A': ['a', 'b']}, {'a': (1, 0), 'b': (1, 1)})
+    game.resolveTurn({'a': RIGHT, 'b': RIGHT})
+    assert locations(game) == {'a': (1, 1), 'b': (1, 2)}
+
+
+def test_blocked_leader_holds_up_its_chain():
+    game = arranged({'A': ['a', 'b']}, {'a': (1, 0), 'b': (1, 1)}, walls=[(1, 2)])
+    game.resolveTurn({'a': RIGHT, 'b': RIGHT})
+    assert locations(game) == {'a': (1, 0), 'b': (1, 1)}
+
+
+def test_swap_stays_put():
+    game = arranged({'A': ['a'], 'B': ['b']}, {'a': (1, 0), 'b': (1, 1)})
+    game.resolveTurn({'a': RIGHT, 'b': LEFT})
+    assert locations(game) == {'a': (1, 0), 'b': (1, 1)}
+
+
+def test_cycle_stays_put():
+    start = {'a': (1, 1), 'b': (1, 2), 'c': (2, 2), 'd': (2, 1)}
+    game = arranged({'A': ['a', 'b'], 'B': ['c', 'd']}, start)
+    game.resolveTurn({'a': RIGHT, 'b': DOWN, 'c': LEFT, 'd': UP})
+    assert locations(game) == start
+
+
+def test_moves_off_the_board_and_into_walls_are_dropped():
+    game = arranged({'A': ['a', 'b']}, {'a': (0, 0), 'b': (2, 2)}, walls=[(2, 3)])
+    game.resolveTurn({'a': UP, 'b': RIGHT})
+    assert locations(game) == {'a': (0, 0), 'b': (2, 2)}
+
+
+def test_game_data_window():
+    game = arranged({'A': ['a', 'b'], 'B': ['c']}, {'a': (2, 2), 'b': (2, 4), 'c': (0, 0)},
+                    walls=[(3, 2)], coins=[((1, 1), Coin1())])
+    data = game.getGameData('a', 1)
+    assert data['currentPosition'] == (2, 2)
+    assert data['walls'] == [(3, 2)]
+    assert data['coin1'] == [(1, 1)]
+    assert data['teammateNames'] == [] and data['enemyPositions'] == []
+    data = game.getGameData('a', 2)
+    assert data['teammateNames'] == ['b'] and data['teammatePositions'] == [(2, 4)]
+    assert data['enemyPositions'] == [(0, 0)]
+
+
+def test_checked_and_unchecked_turns_agree():
+    teams = {'A': ['a1', 'a2'], 'B': ['b1', 'b2']}
+    rng = random.Random(3)
+    turns = [{name: rng.choice(list(Moveset)) for name in ('a1', 'a2', 'b1', 'b2')} for _ in range(200)]
+    checked, unchecked = Game(teams, 12, 12, seed=9), Game(teams, 12, 12, seed=9)
+    for moves in turns:
+        checked.resolveTurn(moves)
+        unchecked.resolveTurn(moves, checked=False)
+    assert locations(checked) == locations(unchecked)
+    assert checked.getScores() == unchecked.getScores()
+    assert checked.map.map.codes.tobytes() == unchecked.map.map.codes.tobytes()
+    assert checked.getGameData('a1') == unchecked.getGameData('a1', checked=False)
+
+
+def test_checked_api_validates_its_arguments():
+    game = Game({'A': ['a'], 'B': ['b']}, seed=1)
+    with pytest.raises(KeyError):
+        game.resolveTurn({'nobody': UP})
+    with pytest.raises(AssertionError):
+        game.resolveTurn({'a': 'UP'})
+    with pytest.raises(KeyError):
+        game.getGameData('nobody')
+    with pytest.raises(AssertionError):
+        game.getGameData(1)
+    with pytest.raises(AssertionError):
+        game.getGameData('a', 2.5)
@@ -0,0 +1,157 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip('paho')
+
+import GameClient
+from mapPool import MapPool
+from wireFormat import decode_map_info
+
+
+class FakeTimer:
+    """
+    Keeps scheduled callbacks until the test fires them
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def schedule(self, key, delay, callback):
+        self.pending[key] = callback
+
+    def cancel(self, key):
+        self.pending.pop(key, None)
+
+    def fire(self, key):
+        self.pending.pop(key)()
+
+    def wait_for(self, key):
+        # Callbacks scheduled from other threads, e.g. the map pool's
+        for _ in range(400):
+            if key in self.pending:
+                return
+            time.sleep(0.01)
+        raise AssertionError(f'nothing was scheduled for {key}')
+
+
+class FakeServer:
+    def __init__(self, map_pool=None, replay_dir=''):
+        self.published = []
+        GameClient.init_lobby_state(self, turn_timer=FakeTimer(), replay_dir=replay_dir,
+                                    map_pool=map_pool or MapPool(size=1))
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+    def send(self, topic, payload):
+        GameClient.handle_message(self, topic.split('/'), payload if isinstance(payload, bytes) else payload.encode())
+
+    def join(self, lobby, players: dict):
+        for player, team in players.items():
+            self.send('new_game', json.dumps({'lobby_name': lobby, 'team_name': team, 'player_name': player}))
+
+    def topics(self, lobby):
+        return [topic for topic, _ in self.published if topic.startswith(f'games/{lobby}/')]
+
+
+def test_big_board_starts_once_the_pool_builds_it():
+    server = FakeServer(MapPool(size=0, sizes=(), inline_cells=100))
+    try:
+        for lobby in ('L', 'M'):
+            server.join(lobby, {f'{lobby}a': 'A', f'{lobby}b': 'B'})
+            server.send(f'games/{lobby}/config', json.dumps({'height': 20, 'width': 20, 'map_info': True,
+                                                            'encoding': 'binary'}))
+            server.send(f'games/{lobby}/start', 'START')
+        server.send('games/L/start', 'START')
+        server.send('games/M/start', 'STOP')
+        assert server.topics('L') == ['games/L/lobby']
+        assert 'L' not in server.game_dict
+
+        server.turn_timer.wait_for('L')
+        server.turn_timer.fire('L')
+        published = dict(server.published)
+        assert json.loads(published['games/L/board'])['height'] == 20
+        map_info = decode_map_info(published['games/L/map_info'])
+        assert map_info['height'] == map_info['width'] == 20
+        assert sorted(map(tuple, map_info['walls'])) == sorted(server.game_dict['L'].map.walls)
+        assert 'games/L/La/game_state' in published
+
+        # The stopped lobby's board is built and dropped
+        time.sleep(0.2)
+        if 'M' in server.turn_timer.pending:
+            server.turn_timer.fire('M')
+        assert 'games/M/board' not in server.topics('M')
+    finally:
+        server.map_pool.close()
+
+
+def test_turn_deadline_resolves_partial_and_empty_turns():
+    server = FakeServer()
+    try:
+        server.join('L', {'a': 'A', 'b': 'B'})
+        server.send('games/L/config', json.dumps({'turn_timeout': 1, 'idle_turn_limit': 2}))
+        server.send('games/L/start', 'START')
+        game = server.game_dict['L']
+        states = server.topics('L').count('games/L/a/game_state')
+
+        # Only a moves, the deadline resolves the turn and b stays put
+        b = game.all_players['b'].loc
+        server.send('games/L/a/move', 'UP')
+        server.turn_timer.fire('L')
+        assert server.turn_dict['L'] == 2 and server.move_dict['L'] == {}
+        assert game.all_players['b'].loc == b
+        assert server.topics('L').count('games/L/a/game_state') == states + 1
+        assert server.topics('L').count('games/L/scores') == 1
+
+        # One empty turn still resolves, the next one in a row ends the game
+        server.turn_timer.fire('L')
+        assert server.turn_dict['L'] == 3 and 'L' in server.game_dict
+        server.turn_timer.fire('L')
+        assert 'L' not in server.game_dict and not server.turn_timer.pending
+        assert server.published[-1] == ('games/L/lobby', 'Game Over: No moves received for too many turns')
+    finally:
+        server.map_pool.close()
+
+
+def test_a_move_resets_the_idle_count():
+    server = FakeServer()
+    try:
+        server.join('L', {'a': 'A', 'b': 'B'})
+        server.send('games/L/config', json.dumps({'turn_timeout': 1, 'idle_turn_limit': 2}))
+        server.send('games/L/start', 'START')
+        for _ in range(3):
+            server.turn_timer.fire('L')
+            server.send('games/L/b/move', 'DOWN')
+            server.turn_timer.fire('L')
+        assert 'L' in server.game_dict and server.turn_dict['L'] == 7
+    finally:
+        server.map_pool.close()
+
+
+def test_second_start_closes_the_replay_it_replaces(tmp_path):
+    server = FakeServer(replay_dir=str(tmp_path))
+    try:
+        server.join('L', {'a': 'A', 'b': 'B'})
+        server.send('games/L/start', 'START')
+        first = server.replay_dict['L']
+        server.send('games/L/start', 'START')
+        assert first.file.closed and not server.replay_dict['L'].file.closed
+        server.send('games/L/start', 'STOP')
+        assert server.replay_dict == {}
+    finally:
+        server.map_pool.close()
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_empty_replay_dir_writes_no_replay(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = FakeServer(replay_dir='')
+    try:
+        server.join('L', {'a': 'A', 'b': 'B'})
+        server.send('games/L/start', 'START')
+        assert server.replay_dict == {}
+    finally:
+        server.map_pool.close()
+    assert list(tmp_path.iterdir()) == []
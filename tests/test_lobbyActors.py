@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('paho')
+
+from GameInstanceManger import LobbyPool
+
+
+class FakeTimer:
+    """
+    Keeps scheduled callbacks until the test fires them
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def schedule(self, key, delay, callback):
+        self.pending[key] = callback
+
+    def cancel(self, key):
+        self.pending.pop(key, None)
+
+    def fire(self, key):
+        self.pending.pop(key)()
+
+
+class Broker:
+    def __init__(self):
+        self.published = []
+        self.lock = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self.lock:
+            self.published.append((topic, payload))
+
+
+def makePool(broker):
+    pool = LobbyPool(broker, max_workers=4)
+    pool.turn_timer = FakeTimer()
+    return pool
+
+
+def drain(pool):
+    pool.shutdown()
+    pool.map_pool.close()
+
+
+def test_configured_lobby_nobody_joins_is_closed():
+    pool = makePool(Broker())
+    try:
+        pool.route('games/L/config', json.dumps({'delta': True}).encode())
+        pool.route('games/M/config', json.dumps({'delta': True}).encode())
+        pool.route('new_game', json.dumps({'lobby_name': 'M', 'team_name': 'A', 'player_name': 'a'}).encode())
+        for _ in range(400):
+            if {('L', 'config'), ('M', 'config')} <= set(pool.turn_timer.pending):
+                break
+            time.sleep(0.01)
+        assert set(pool.lobbies) == {'L', 'M'}
+
+        pool.turn_timer.fire(('L', 'config'))
+        pool.turn_timer.fire(('M', 'config'))
+    finally:
+        drain(pool)
+    # M has a player, its config stays until the game is over
+    assert set(pool.lobbies) == {'M'}
+    assert pool.lobbies['M'].config_dict['M'].delta
+
+
+def test_messages_racing_teardown_are_all_handled():
+    # Every STOP tears the lobby down while other threads keep routing messages to it, each one
+    # must still reach an actor and no actor may be left behind once they are all handled
+    broker = Broker()
+    pool = makePool(broker)
+    rounds = 100
+
+    def player(thread):
+        for i in range(rounds):
+            name = f'p{thread}_{i}'
+            pool.route('new_game', json.dumps({'lobby_name': 'L', 'team_name': 'A', 'player_name': name}).encode())
+            pool.route('games/L/start', b'STOP')
+
+    threads = [threading.Thread(target=player, args=(thread,)) for thread in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        drain(pool)
+    stops = [payload for topic, payload in broker.published if topic == 'games/L/lobby']
+    assert len(stops) == 4 * rounds
+    assert pool.lobbies == {}
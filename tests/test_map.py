@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+from gameItems import COIN1, COIN2, COIN3, EMPTY, PLAYER, WALL, Coin1, Coin2, Coin3, Wall
+from map import Map, MapLayout, getDefaultWallChoices, getWallChoices
+from player import Player
+
+
+def makeMap(height=20, width=20, numPlayers=4, seed=1, **options):
+    players = [Player(f'p{i}', None) for i in range(numPlayers)]
+    return Map(height, width, players, rng=random.Random(seed), **options), players
+
+
+def test_map_view_is_read_only():
+    m, _ = makeMap()
+    view = m.map
+    with pytest.raises(TypeError):
+        view.codes[0, 0] = WALL
+    snapshot = m.snapshot()
+    coin = next(iter(m.coinPositions()))
+    m.set(coin, None)
+    assert view.codes[coin] == EMPTY
+    assert snapshot.codes[coin] != EMPTY
+
+
+def test_same_seed_same_map():
+    first, firstPlayers = makeMap(seed=42)
+    second, secondPlayers = makeMap(seed=42)
+    assert first.map.codes.tobytes() == second.map.codes.tobytes()
+    assert [p.loc for p in firstPlayers] == [p.loc for p in secondPlayers]
+    other, _ = makeMap(seed=43)
+    assert other.map.codes.tobytes() != first.map.codes.tobytes()
+
+
+def test_cell_items_are_flyweights():
+    assert Wall() is Wall()
+    assert Coin1() is Coin1() and Coin1() is not Coin2()
+    assert [item.code for item in (Wall(), Coin1(), Coin2(), Coin3())] == [WALL, COIN1, COIN2, COIN3]
+    m, _ = makeMap()
+    wall = next(iter(m.walls))
+    assert m.get(wall) is Wall()
+    coin = next(iter(m.coinPositions(3)))
+    assert m.get(coin) is Coin3()
+
+
+def test_window_finds_every_item():
+    m, players = makeMap(15, 15)
+    found = m.window(2, 9, 3, 12)
+    for code, locs in enumerate(found):
+        for x, y in locs:
+            assert 2 <= x <= 9 and 3 <= y <= 12 and m.getCode((x, y)) == code
+    expected = sum(1 for x in range(2, 10) for y in range(3, 13) if m.getCode((x, y)) != EMPTY)
+    assert sum(map(len, found)) == expected
+
+
+def test_indexes_match_the_grid():
+    m, players = makeMap(30, 25)
+    codes = m.map.codes
+    cells = {code: set() for code in (EMPTY, WALL, COIN1, COIN2, COIN3, PLAYER)}
+    for x in range(m.height):
+        for y in range(m.width):
+            cells[codes[x, y]].add((x, y))
+    assert cells[WALL] == m.walls
+    assert cells[COIN1] == m.coinPositions(1) and cells[COIN2] == m.coinPositions(2)
+    assert cells[COIN3] == m.coinPositions(3)
+    assert len(m.coinPositions()) == m.numCoins
+    assert cells[PLAYER] == set(m.players) == {player.loc for player in players}
+
+
+def bruteCoins(m: Map) -> dict:
+    values = {COIN1: 1, COIN2: 2, COIN3: 3}
+    codes = m.map.codes
+    return {(x, y): values[codes[x, y]] for x in range(m.height) for y in range(m.width) if codes[x, y] in values}
+
+
+def test_coin_queries_match_brute_force():
+    # Sizes off the bucket grid so the last row and column of buckets are partial
+    m, _ = makeMap(37, 29, seed=5)
+    rng = random.Random(5)
+    while m.numCoins:
+        coins = bruteCoins(m)
+        assert m.numCoins == len(coins)
+        loc = (rng.randrange(m.height), rng.randrange(m.width))
+        radius = rng.choice((0, 1, 2, 7, 8, 40))
+        within = {coin: value for coin, value in coins.items()
+                  if abs(coin[0] - loc[0]) <= radius and abs(coin[1] - loc[1]) <= radius}
+        found = m.coinsWithin(loc, radius)
+        assert dict(found) == within and len(found) == len(within)
+
+        nearest = min(coins.items(), key=lambda item: (abs(item[0][0] - loc[0]) + abs(item[0][1] - loc[1]),
+                                                       -item[1], item[0]))
+        assert m.nearestCoin(loc) == nearest
+        # Take a few coins so the counts are checked as the board empties
+        for coin in rng.sample(sorted(coins), len(coins) // 10 + 1):
+            m.set(coin, None)
+    assert not bruteCoins(m) and m.nearestCoin((0, 0)) is None
+
+
+def test_no_coins_left():
+    m, _ = makeMap(12, 12)
+    for coin in m.coinPositions():
+        m.set(coin, None)
+    assert m.numCoins == 0
+    assert m.nearestCoin((0, 0)) is None
+    assert m.coinsWithin((5, 5), 20) == []
+    m.set((11, 11), Coin2())
+    assert m.nearestCoin((0, 0)) == ((11, 11), 2)
+    assert m.coinsWithin((10, 10), 1) == [((11, 11), 2)]
+
+
+def test_players_fit_on_a_crowded_board():
+    cells = [(x, y) for x in range(10) for y in range(10)]
+    for seed in range(20):
+        m, players = makeMap(10, 10, 6, seed, wallChoices=cells[:95])
+        assert len({p.loc for p in players}) == 6
+        assert not {p.loc for p in players} & (m.walls | m.coinPositions())
+
+
+def test_layout_from_cells():
+    # Only (0, 2) and (2, 1) are free
+    cells = bytes([WALL, COIN1, EMPTY,
+                   COIN3, WALL, COIN2,
+                   WALL, EMPTY, COIN1])
+    layout = MapLayout.fromCells(3, 3, cells, random.Random(0))
+    assert list(layout.takenOffsets) == [0, 0, 1, 1, 1, 1, 2]
+    assert layout.numCoins == 4 and list(layout.coinBuckets) == [4]
+    players = [Player('a', None), Player('b', None)]
+    m = Map(3, 3, players, layout=layout)
+    assert {p.loc for p in players} == {(0, 2), (2, 1)}
+    assert m.numCoins == 4 and m.nearestCoin((2, 1)) == ((2, 2), 1)
+
+
+def test_wall_choices_tile_the_default_layout():
+    assert getWallChoices(10, 10) == getDefaultWallChoices()
+    tiled = set(getWallChoices(25, 17))
+    assert all(x < 25 and y < 17 for x, y in tiled)
+    assert {(x + 10, y) for x, y in getDefaultWallChoices()} <= tiled
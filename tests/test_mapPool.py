@@ -0,0 +1,62 @@
+import time
+
+from mapPool import MapPool
+
+
+def waitFor(pool, dims, count=1):
+    for _ in range(400):
+        if pool.stats()['ready'].get(dims, 0) >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f'no {dims} layout was generated')
+
+
+def test_big_board_is_built_in_the_background():
+    pool = MapPool(size=0, inline_cells=100)
+    try:
+        assert pool.take(20, 20) is None
+        waitFor(pool, '20x20')
+        layout = pool.take(20, 20)
+        assert (layout.height, layout.width) == (20, 20)
+        assert pool.take(10, 10) is not None
+    finally:
+        pool.close()
+
+
+def test_least_recently_taken_size_is_dropped():
+    pool = MapPool(size=1, sizes=(), max_sizes=2)
+    try:
+        for dims in ((10, 10), (11, 11), (10, 10), (12, 12)):
+            pool.take(*dims)
+        assert set(pool.stats()['ready']) == {'10x10', '12x12'}
+    finally:
+        pool.close()
+
+
+def test_ready_cells_stay_within_max_cells():
+    pool = MapPool(size=8, sizes=((10, 10), (30, 30)), max_cells=1_000)
+    try:
+        waitFor(pool, '10x10', 1)
+        time.sleep(0.2)
+        ready = pool.stats()['ready']
+        assert ready['10x10'] * 100 + ready['30x30'] * 900 <= 1_000
+    finally:
+        pool.close()
+
+
+def test_empty_take_hands_the_layout_to_on_ready():
+    pool = MapPool(size=0, sizes=(), inline_cells=100)
+    delivered = []
+    try:
+        assert pool.take(20, 20, on_ready=delivered.append) is None
+        assert pool.take(20, 20, on_ready=delivered.append) is None
+        for _ in range(400):
+            if len(delivered) == 2:
+                break
+            time.sleep(0.01)
+        assert [(layout.height, layout.width) for layout in delivered] == [(20, 20), (20, 20)]
+        assert delivered[0] is not delivered[1]
+        # Handed out, not kept ready
+        assert pool.stats()['ready']['20x20'] == 0
+    finally:
+        pool.close()
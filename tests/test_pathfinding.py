@@ -0,0 +1,57 @@
+import random
+
+from pathfinding import DistanceFields, distance_field
+
+WALLS = [(1, 1), (1, 2), (1, 3), (3, 0), (3, 1), (3, 2)]
+
+
+def test_distance_is_symmetric():
+    fields = DistanceFields(5, 5, WALLS)
+    for pos in ((0, 0), (2, 4), (4, 4)):
+        for target in ((0, 4), (4, 0), (2, 2)):
+            assert fields.distance(pos, target) == fields.distance(target, pos)
+    assert fields.distance((0, 0), (4, 0)) == 10
+    assert fields.distance((0, 0), (1, 1)) is None
+
+
+def test_next_step_walks_a_shortest_path():
+    fields = DistanceFields(5, 5, WALLS)
+    pos, steps = (0, 0), 0
+    while pos != (4, 0):
+        dx, dy = fields.next_step(pos, (4, 0))
+        pos = (pos[0] + dx, pos[1] + dy)
+        steps += 1
+    assert steps == fields.distance((0, 0), (4, 0))
+    assert fields.next_step((2, 4), (4, 0), blocked={(3, 4), (2, 3)}) is None
+
+
+def test_cache_is_bounded():
+    fields = DistanceFields(10, 10, [], max_cells=300)
+    for x in range(10):
+        fields.field((x, 0))
+    assert len(fields.fields) == 3
+    assert list(fields.fields) == [(7, 0), (8, 0), (9, 0)]
+    fields.field((7, 0))
+    fields.field((0, 5))
+    assert list(fields.fields) == [(9, 0), (7, 0), (0, 5)]
+
+
+def test_fields_match_a_search():
+    rng = random.Random(2)
+    height, width = 13, 9
+    walls = rng.sample([(x, y) for x in range(height) for y in range(width)], 35)
+    fields = DistanceFields(height, width, walls)
+    passable = {(x, y) for x in range(height) for y in range(width)} - set(walls)
+    for target in rng.sample(sorted(passable), 10):
+        distances = distance_field(target, passable)[0]
+        for x in range(height):
+            for y in range(width):
+                assert fields.distance((x, y), target) == distances.get((x, y))
+
+
+def test_fields_are_cached_by_target():
+    fields = DistanceFields(10, 10, WALLS)
+    for pos in ((0, 0), (5, 5), (9, 9)):
+        fields.distance(pos, (4, 4))
+        fields.next_step(pos, (4, 4))
+    assert list(fields.fields) == [(4, 4)]
@@ -0,0 +1,63 @@
+import io
+import random
+
+from game import Game
+from moveset import Moveset
+from replay import ReplayWriter, read_replay, replay_game
+
+
+class KeptBytesIO(io.BytesIO):
+    # ReplayWriter closes its file at the end, keep the bytes readable afterwards
+    def close(self):
+        pass
+
+
+def record(teams, seed, turns, height=10, width=10):
+    file = KeptBytesIO()
+    writer = ReplayWriter(file, seed, teams, height, width)
+    game = Game(teams, width, height, seed=seed)
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(turns):
+        turn = {name: rng.choice(list(Moveset)) for name in game.all_players if rng.random() < 0.8}
+        writer.turn(turn)
+        game.resolveTurn(turn)
+        moves.append(turn)
+    writer.end(game.getScores())
+    return file.getvalue(), moves, game
+
+
+def test_round_trip_replays_to_the_same_game():
+    teams = {'A': ['a1', 'a2'], 'B': ['b1', 'b2']}
+    data, moves, game = record(teams, 1234, 100, 12, 15)
+    log = read_replay(data)
+    assert (log['seed'], log['height'], log['width']) == (1234, 12, 15)
+    assert log['teams'] == teams
+    assert log['turns'] == moves
+    assert log['scores'] == game.getScores()
+
+    replayed = replay_game(log)
+    assert replayed.getScores() == game.getScores()
+    assert {name: player.loc for name, player in replayed.all_players.items()} == \
+           {name: player.loc for name, player in game.all_players.items()}
+
+
+def test_more_than_255_teams_and_players():
+    teams = {f'team{t}': [f'player{t}_{p}' for p in range(2)] for t in range(300)}
+    data, moves, game = record(teams, 7, 3, 60, 60)
+    log = read_replay(data)
+    assert log['teams'] == teams
+    assert log['turns'] == moves
+    assert log['scores'] == game.getScores()
+
+
+def test_log_without_end_has_no_scores():
+    teams = {'A': ['a'], 'B': ['b']}
+    _, moves, _ = record(teams, 3, 5)
+    file = KeptBytesIO()
+    writer = ReplayWriter(file, 3, teams)
+    for turn in moves:
+        writer.turn(turn)
+    log = read_replay(file.getvalue())
+    assert log['turns'] == moves
+    assert log['scores'] is None
@@ -0,0 +1,44 @@
+import copy
+import random
+
+from game import Game
+from moveset import Moveset
+from stateDelta import apply_game_state, diff_game_data, make_keyframe
+
+
+def playedStates(turns=60, seed=2):
+    game = Game({'A': ['a1', 'a2'], 'B': ['b1', 'b2']}, 12, 12, seed=seed)
+    rng = random.Random(seed)
+    states = [game.getGameData('a1', 3)]
+    for _ in range(turns):
+        game.resolveTurn({name: rng.choice(list(Moveset)) for name in game.all_players})
+        states.append(game.getGameData('a1', 3))
+    return states
+
+
+def test_deltas_rebuild_every_state():
+    states = playedStates()
+    state = apply_game_state(None, make_keyframe(states[0]))
+    assert state == states[0]
+    for old, new in zip(states, states[1:]):
+        state = apply_game_state(state, diff_game_data(old, new))
+        for key, value in new.items():
+            assert sorted(state[key]) == sorted(value) if isinstance(value, list) else state[key] == value
+
+
+def test_unchanged_state_gives_an_empty_delta():
+    state = playedStates(0)[0]
+    delta = diff_game_data(state, copy.deepcopy(state))
+    assert delta == {'kind': 'delta', 'currentPosition': state['currentPosition']}
+
+
+def test_delta_without_a_base_state_is_dropped():
+    old, new = playedStates(1)
+    assert apply_game_state(None, diff_game_data(old, new)) is None
+
+
+def test_apply_leaves_the_previous_state_alone():
+    old, new = playedStates(1)
+    previous = copy.deepcopy(old)
+    apply_game_state(old, diff_game_data(old, new))
+    assert old == previous
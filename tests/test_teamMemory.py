@@ -0,0 +1,48 @@
+from teamMemory import TeamMemory
+
+
+def state(position, teammates=(), enemies=(), coin1=(), coin3=(), walls=()):
+    return {'currentPosition': list(position), 'teammateNames': [f't{i}' for i in range(len(teammates))],
+            'teammatePositions': [list(pos) for pos in teammates], 'enemyPositions': [list(pos) for pos in enemies],
+            'coin1': [list(pos) for pos in coin1], 'coin2': [], 'coin3': [list(pos) for pos in coin3],
+            'walls': [list(pos) for pos in walls]}
+
+
+def square(x, y, radius=1):
+    return {(x + dx, y + dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)}
+
+
+def test_views_of_the_team_are_merged():
+    memory = TeamMemory(10, 10, 1)
+    memory.update({'a': state((1, 1), walls=[(0, 0)], coin1=[(2, 2)]),
+                   'b': state((7, 7), enemies=[(8, 8)], coin3=[(6, 6)])})
+    assert set(memory.seen) == square(1, 1) | square(7, 7)
+    assert memory.walls == {(0, 0)}
+    assert memory.coins == {(2, 2): 1, (6, 6): 3}
+    assert memory.enemies == {(8, 8): 1}
+    assert memory.players == {(1, 1), (7, 7), (8, 8)}
+    assert memory.passable() == (square(1, 1) | square(7, 7)) - {(0, 0), (1, 1), (7, 7), (8, 8)}
+
+
+def test_coins_and_enemies_expire_once_seen_gone():
+    memory = TeamMemory(10, 10, 1)
+    memory.update({'a': state((1, 1), coin1=[(2, 2)], enemies=[(0, 2)])})
+    # Out of view, the team still remembers them
+    memory.update({'a': state((5, 5))})
+    assert memory.coins == {(2, 2): 1} and memory.enemies == {(0, 2): 1}
+    assert memory.players == {(5, 5)}
+    # Back in view without them, the coin was taken and the enemy moved on
+    memory.update({'a': state((1, 2), enemies=[(2, 3)])})
+    assert memory.coins == {}
+    assert memory.enemies == {(2, 3): 3}
+    assert memory.seen[(0, 2)] == 3 and memory.seen[(5, 5)] == 2
+
+
+def test_frontier_borders_known_free_cells():
+    memory = TeamMemory(5, 5, 1)
+    memory.update({'a': state((0, 0), walls=[(1, 1)])})
+    # The view is clipped to rows and columns 0-1, (1, 2) and (2, 1) only border the wall
+    assert memory.frontier() == {(0, 2), (2, 0)}
+    memory.update({'a': state((3, 3))})
+    assert not memory.frontier() & set(memory.seen)
+    assert all(0 <= x < 5 and 0 <= y < 5 for x, y in memory.frontier())
@@ -0,0 +1,28 @@
+import threading
+
+from turnTimer import TurnTimer
+
+
+def test_failing_callback_does_not_stop_the_timer():
+    timer = TurnTimer()
+    fired = threading.Event()
+
+    def fail():
+        raise RuntimeError('resolve_turn failed')
+
+    timer.schedule('a', 0, fail)
+    timer.schedule('b', 0.05, fired.set)
+    assert fired.wait(2)
+
+
+def test_cancelled_and_rescheduled_deadlines_fire_once():
+    timer = TurnTimer()
+    calls = []
+    done = threading.Event()
+    timer.schedule('a', 0.01, lambda: calls.append('old'))
+    timer.schedule('a', 0.02, lambda: calls.append('new'))
+    timer.schedule('b', 0.01, lambda: calls.append('cancelled'))
+    timer.cancel('b')
+    timer.schedule('c', 0.1, done.set)
+    assert done.wait(2)
+    assert calls == ['new']
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from game import Game
+from moveset import Moveset
+from stateDelta import diff_game_data, make_keyframe
+from wireFormat import (MAX_JSON_MAP_INFO_CELLS, decode_game_state, decode_map_info, decode_scores, encode_game_state,
+                        encode_map_info, encode_scores)
+
+
+def asJson(message):
+    # What a JSON client would decode, tuples become lists
+    return json.loads(json.dumps(message))
+
+
+def gameStates():
+    game = Game({'A': ['a1', 'a2'], 'B': ['b1']}, 12, 12, seed=5)
+    before = game.getGameData('a1', 3)
+    game.resolveTurn({'a1': Moveset.DOWN, 'a2': Moveset.LEFT, 'b1': Moveset.UP})
+    after = game.getGameData('a1', 3)
+    return before, after
+
+
+@pytest.mark.parametrize('encoding', ['json', 'binary'])
+def test_game_state_round_trip(encoding):
+    before, after = gameStates()
+    for message in (before, make_keyframe(before), diff_game_data(before, after)):
+        assert decode_game_state(encode_game_state(message, encoding)) == asJson(message)
+
+
+def test_binary_is_smaller_than_json():
+    before, _ = gameStates()
+    assert len(encode_game_state(before, 'binary')) < len(encode_game_state(before, 'json'))
+
+
+@pytest.mark.parametrize('encoding', ['json', 'binary'])
+def test_scores_round_trip(encoding):
+    scores = {'A': 12, 'B': 0, 'Ünïcode': -3}
+    assert decode_scores(encode_scores(scores, encoding)) == scores
+
+
+def test_scores_with_more_than_255_teams():
+    scores = {f'team{t}': t for t in range(300)}
+    assert decode_scores(encode_scores(scores, 'binary')) == scores
+
+
+def test_rejects_other_versions():
+    payload = bytearray(encode_scores({'A': 1}, 'binary'))
+    payload[0] = 99
+    with pytest.raises(ValueError):
+        decode_scores(bytes(payload))
+
+
+@pytest.mark.parametrize('encoding', ['json', 'binary'])
+def test_map_info_round_trip(encoding):
+    game = Game({'A': ['a1'], 'B': ['b1']}, width=17, height=12, seed=5)
+    payload = encode_map_info(12, 17, game.map.wallMask(), encoding)
+    assert decode_map_info(payload) == asJson(game.getMapInfo())
+
+
+def test_big_map_info_is_binary():
+    height = MAX_JSON_MAP_INFO_CELLS // 500 + 1
+    payload = encode_map_info(height, 500, bytes(height * 500), 'json')
+    assert payload[:1] != b'{'
+    assert decode_map_info(payload) == {'height': height, 'width': 500, 'walls': []}
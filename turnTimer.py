@@ -0,0 +1,60 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class TurnTimer:
+    """
+    Runs the turn deadlines of every lobby from one heap on one thread.
+    Rescheduling or cancelling a key leaves its old heap entry behind, it is skipped once it comes due.
+    """
+
+    def __init__(self):
+        self.__heap = []
+        self.__current = {}  # key -> sequence number of its live heap entry
+        self.__seq = itertools.count()
+        self.__cond = threading.Condition()
+        self.__thread = None
+
+    def schedule(self, key, delay: float, callback):
+        """
+        Calls callback() on the timer thread after delay seconds, replacing any deadline key already has
+        """
+        with self.__cond:
+            seq = next(self.__seq)
+            self.__current[key] = seq
+            heapq.heappush(self.__heap, (time.monotonic() + delay, seq, key, callback))
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            self.__cond.notify()
+
+    def cancel(self, key):
+        with self.__cond:
+            self.__current.pop(key, None)
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while True:
+                    if not self.__heap:
+                        self.__cond.wait()
+                        continue
+                    deadline, seq, key, callback = self.__heap[0]
+                    if self.__current.get(key) != seq:
+                        heapq.heappop(self.__heap)
+                        continue
+                    delay = deadline - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self.__heap)
+                        del self.__current[key]
+                        break
+                    self.__cond.wait(delay)
+            # Every lobby shares this thread, one failing deadline must not stop the others
+            try:
+                callback()
+            except Exception:
+                print(f"Turn deadline for {key} failed:")
+                traceback.print_exc()
@@ -0,0 +1,196 @@
+"""
+Compact binary encoding of game_state and scores messages, the alternative to JSON a lobby can pick.
+
+Every message starts with a version byte and a message type byte. A game_state then holds its kind
+(plain snapshot, delta mode keyframe or delta), the current position, and one section per cell type:
+the cell code, an entry count and the entries' coordinates as little-endian u16 pairs. Teammate
+entries also carry the player's name. In deltas a removed section has REMOVED set in its code.
+
+A map_info holds the board size and its walls as a zlib-compressed row-major mask, one byte per cell.
+
+Payloads starting with '{' are JSON, so the decoders accept either encoding.
+"""
+
+import json
+import struct
+import zlib
+
+from gameItems import WALL, COIN1, COIN2, COIN3
+
+VERSION = 2  # 2: score counts and name lengths are u16
+
+MSG_GAME_STATE = 1
+MSG_SCORES = 2
+MSG_MAP_INFO = 3
+
+KIND_PLAIN = 0
+KIND_FULL = 1
+KIND_DELTA = 2
+KINDS = {None: KIND_PLAIN, 'full': KIND_FULL, 'delta': KIND_DELTA}
+
+# Section codes, map cells keep their gameItems codes
+TEAMMATE = 6
+ENEMY = 7
+REMOVED = 0x80
+
+POSITION_SECTIONS = ((ENEMY, 'enemyPositions'), (COIN1, 'coin1'), (COIN2, 'coin2'), (COIN3, 'coin3'), (WALL, 'walls'))
+SECTION_KEYS = dict(POSITION_SECTIONS)
+
+HEADER = struct.Struct('<BBBHH')  # version, message type, kind, current x, current y
+SECTION = struct.Struct('<BH')  # code, entry count
+POSITION = struct.Struct('<HH')
+SCORES_HEADER = struct.Struct('<BBH')  # version, message type, team count
+NAME_LENGTH = struct.Struct('<H')
+SCORE = struct.Struct('<i')
+MAP_INFO_HEADER = struct.Struct('<BBHH')  # version, message type, height, width
+
+# Largest board whose map_info is sent as JSON, a wall list of bigger boards runs to megabytes
+MAX_JSON_MAP_INFO_CELLS = 100_000
+
+
+def encode_game_state(message: dict, encoding: str = 'json') -> bytes:
+    """
+    :param message: game data, keyframe or delta as built by GameClient
+    :param encoding: 'json' or 'binary'
+    """
+    if encoding == 'json':
+        return json.dumps(message).encode()
+
+    kind = KINDS[message.get('kind')]
+    x, y = message['currentPosition']
+    parts = [HEADER.pack(VERSION, MSG_GAME_STATE, kind, x, y)]
+    if kind == KIND_DELTA:
+        for code, key in POSITION_SECTIONS:
+            if key in message.get('added', {}):
+                parts.append(encode_positions(code, message['added'][key]))
+            if key in message.get('removed', {}):
+                parts.append(encode_positions(code | REMOVED, message['removed'][key]))
+        if 'teammateNames' in message:
+            parts.append(encode_teammates(message['teammateNames'], message['teammatePositions']))
+    else:
+        for code, key in POSITION_SECTIONS:
+            if message[key]:
+                parts.append(encode_positions(code, message[key]))
+        if message['teammateNames']:
+            parts.append(encode_teammates(message['teammateNames'], message['teammatePositions']))
+    return b''.join(parts)
+
+
+def decode_game_state(payload: bytes) -> dict:
+    """
+    Decodes a game_state payload in either encoding into the dict json.loads would give
+    """
+    if payload[:1] == b'{':
+        return json.loads(payload)
+
+    version, msg_type, kind, x, y = HEADER.unpack_from(payload)
+    if version != VERSION or msg_type != MSG_GAME_STATE:
+        raise ValueError(f'not a version {VERSION} game_state message')
+
+    message = {'currentPosition': [x, y]}
+    if kind == KIND_DELTA:
+        message['kind'] = 'delta'
+    else:
+        if kind == KIND_FULL:
+            message['kind'] = 'full'
+        message.update({'teammateNames': [], 'teammatePositions': []})
+        message.update({key: [] for _, key in POSITION_SECTIONS})
+
+    offset = HEADER.size
+    while offset < len(payload):
+        code, count = SECTION.unpack_from(payload, offset)
+        offset += SECTION.size
+        if code == TEAMMATE:
+            names, positions = [], []
+            for _ in range(count):
+                (length,) = NAME_LENGTH.unpack_from(payload, offset)
+                offset += NAME_LENGTH.size
+                names.append(payload[offset:offset + length].decode())
+                offset += length
+                positions.append(list(POSITION.unpack_from(payload, offset)))
+                offset += POSITION.size
+            message['teammateNames'], message['teammatePositions'] = names, positions
+            continue
+
+        coords = struct.unpack_from(f'<{2 * count}H', payload, offset)
+        offset += 4 * count
+        pairs = iter(coords)
+        positions = [[px, py] for px, py in zip(pairs, pairs)]
+        key = SECTION_KEYS[code & ~REMOVED]
+        if kind != KIND_DELTA:
+            message[key] = positions
+        else:
+            message.setdefault('removed' if code & REMOVED else 'added', {})[key] = positions
+    return message
+
+
+def encode_scores(scores: dict, encoding: str = 'json') -> bytes:
+    if encoding == 'json':
+        return json.dumps(scores).encode()
+
+    parts = [SCORES_HEADER.pack(VERSION, MSG_SCORES, len(scores))]
+    for team, score in scores.items():
+        name = team.encode()
+        parts.append(NAME_LENGTH.pack(len(name)) + name + SCORE.pack(score))
+    return b''.join(parts)
+
+
+def decode_scores(payload: bytes) -> dict:
+    if payload[:1] == b'{':
+        return json.loads(payload)
+
+    version, msg_type, count = SCORES_HEADER.unpack_from(payload)
+    if version != VERSION or msg_type != MSG_SCORES:
+        raise ValueError(f'not a version {VERSION} scores message')
+    scores, offset = {}, SCORES_HEADER.size
+    for _ in range(count):
+        (length,) = NAME_LENGTH.unpack_from(payload, offset)
+        offset += NAME_LENGTH.size
+        team = payload[offset:offset + length].decode()
+        offset += length
+        (scores[team],) = SCORE.unpack_from(payload, offset)
+        offset += SCORE.size
+    return scores
+
+
+def encode_positions(code: int, positions: list) -> bytes:
+    coords = [c for pos in positions for c in pos]
+    return SECTION.pack(code, len(positions)) + struct.pack(f'<{len(coords)}H', *coords)
+
+
+def encode_teammates(names: list, positions: list) -> bytes:
+    parts = [SECTION.pack(TEAMMATE, len(names))]
+    for name, pos in zip(names, positions):
+        name = name.encode()
+        parts.append(NAME_LENGTH.pack(len(name)) + name + POSITION.pack(*pos))
+    return b''.join(parts)
+
+
+def encode_map_info(height: int, width: int, wall_mask: bytes, encoding: str = 'json') -> bytes:
+    """
+    :param wall_mask: row-major cells, 1 for walls, see Map.wallMask
+    :param encoding: 'json' or 'binary', boards over MAX_JSON_MAP_INFO_CELLS are always binary
+    """
+    if encoding == 'json' and height * width <= MAX_JSON_MAP_INFO_CELLS:
+        walls = [list(divmod(idx, width)) for idx, wall in enumerate(wall_mask) if wall]
+        return json.dumps({'height': height, 'width': width, 'walls': walls}).encode()
+    # The fastest level, it runs under the lobby lock: 4M cells compress to 0.6MB in about 50ms
+    return MAP_INFO_HEADER.pack(VERSION, MSG_MAP_INFO, height, width) + zlib.compress(bytes(wall_mask), 1)
+
+
+def decode_map_info(payload: bytes) -> dict:
+    """
+    :return: {height, width, walls: [[x, y], ...]} in either encoding, as Game.getMapInfo gives it
+    """
+    if payload[:1] == b'{':
+        return json.loads(payload)
+
+    version, msg_type, height, width = MAP_INFO_HEADER.unpack_from(payload)
+    if version != VERSION or msg_type != MSG_MAP_INFO:
+        raise ValueError(f'not a version {VERSION} map_info message')
+    mask = zlib.decompress(payload[MAP_INFO_HEADER.size:])
+    walls, idx = [], mask.find(1)
+    while idx != -1:
+        walls.append(list(divmod(idx, width)))
+        idx = mask.find(1, idx + 1)
+    return {'height': height, 'width': width, 'walls': walls}